@@ -0,0 +1,84 @@
+"""Benchmark cargo fit matching over a synthetic fleet.
+
+Usage: python benchmark_fleet_index.py [fleet_size]
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+
+from server import FleetIndex, ShipmentItem, shipment_requirements
+
+
+def make_fleet(size: int) -> list:
+    rng = random.Random(42)
+    fleet = []
+    for i in range(size):
+        fleet.append({
+            "id": f"vehicle-{i}",
+            "vehicle_type": "cargo",
+            "available": True,
+            "capacity_tons": round(rng.uniform(0.5, 40), 1),
+            "dimensions_length": round(rng.uniform(2, 13.6), 1),
+            "dimensions_width": round(rng.uniform(1.5, 2.5), 2),
+            "dimensions_height": round(rng.uniform(1.5, 3.2), 2),
+            "price_per_km": round(rng.uniform(8, 60), 2),
+        })
+    return fleet
+
+
+async def rebuild_stall_ms(fleet: list) -> float:
+    """Rebuild in a worker thread, as refresh_fleet_index does, while timing a 1 ms ticker on the loop"""
+    longest = 0.0
+    rebuild = asyncio.create_task(asyncio.to_thread(FleetIndex.build, fleet))
+    while not rebuild.done():
+        started = time.perf_counter()
+        await asyncio.sleep(0.001)
+        longest = max(longest, (time.perf_counter() - started) * 1000 - 1)
+    await rebuild
+    return longest
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    fleet = make_fleet(size)
+
+    index = FleetIndex()
+    started = time.perf_counter()
+    index.load(fleet)
+    load_ms = (time.perf_counter() - started) * 1000
+    print(f"Loaded {len(index)} vehicles in {load_ms:.1f} ms")
+    print(f"Longest event loop stall during a threaded rebuild: {asyncio.run(rebuild_stall_ms(fleet)):.1f} ms")
+
+    shipments = [
+        [ShipmentItem(weight_tons=0.8, length=1.2, width=0.8, height=1.5, quantity=10)],
+        [ShipmentItem(weight_tons=5, length=6, width=2.2, height=2.5)],
+        [
+            ShipmentItem(weight_tons=2, length=2, width=1.2, height=1, quantity=3),
+            ShipmentItem(weight_tons=0.3, length=0.6, width=0.4, height=0.4, quantity=20),
+        ],
+    ]
+    rounds = 200
+    for items in shipments:
+        requirements = shipment_requirements(items)
+        started = time.perf_counter()
+        for _ in range(rounds):
+            matches = index.match(*requirements, limit=50)
+        per_query_ms = (time.perf_counter() - started) * 1000 / rounds
+        print(f"requirements={tuple(round(r, 2) for r in requirements[:5])} "
+              f"matches={len(matches)} {per_query_ms:.3f} ms/query")
+
+    started = time.perf_counter()
+    for vehicle in fleet[:10_000]:
+        index.upsert(dict(vehicle, price_per_km=vehicle["price_per_km"] + 1))
+    for vehicle in fleet[:10_000:2]:
+        index.remove(vehicle["id"])
+    churn_ms = (time.perf_counter() - started) * 1000
+    print(f"10000 upserts + 5000 removes in {churn_ms:.1f} ms, {len(index)} vehicles left")
+
+
+if __name__ == "__main__":
+    main()
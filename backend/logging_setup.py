@@ -0,0 +1,276 @@
+"""Non-blocking structured logging for the TransportPro API.
+
+Log calls on the event loop only enqueue the record. A QueueListener thread
+formats records as JSON lines and writes them out, so neither formatting nor
+stream I/O happens on the loop. Records carry the request id, route, user id
+and accumulated storage time of the request that emitted them.
+"""
+import copy
+import inspect
+import json
+import logging
+import queue
+import random
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Mapping, Optional
+
+from fastapi import Request
+
+# Attributes every LogRecord has; anything else was passed through `extra`.
+# uvicorn adds an ANSI-coloured copy of its messages as color_message.
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "color_message"}
+_CONTEXT_FIELDS = ("request_id", "route", "user_id", "db_ms")
+# Message arguments of these types can be interpolated later on the listener thread
+_IMMUTABLE_ARGS = (str, int, float, bytes, type(None))
+_EXC_FORMATTER = logging.Formatter()
+
+
+class RequestContext:
+    """Per-request log fields, shared by reference with tasks spawned for the request"""
+
+    __slots__ = ("request_id", "route", "user_id", "db_ms")
+
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.route: Optional[str] = None
+        self.user_id: Optional[str] = None
+        self.db_ms = 0.0
+
+
+request_context: ContextVar[Optional[RequestContext]] = ContextVar("request_context", default=None)
+
+
+class ContextFilter(logging.Filter):
+    """Copy the current request context onto the record before it leaves the loop thread"""
+
+    def filter(self, record):
+        ctx = request_context.get()
+        if ctx is not None:
+            record.request_id = ctx.request_id
+            record.route = ctx.route
+            record.user_id = ctx.user_id
+            record.db_ms = round(ctx.db_ms, 3)
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in _CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and key not in entry and value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that never blocks and counts records dropped on a full queue.
+
+    Unlike the stock handler, prepare() only formats the message when one of
+    its arguments is mutable, so interpolating scalars happens on the listener
+    thread.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._unreported = 0
+
+    def prepare(self, record):
+        """Snapshot the record as it is now; the caller may change its arguments
+        or exception before the listener thread gets to it"""
+        record = copy.copy(record)
+        if record.args:
+            args = record.args.values() if isinstance(record.args, Mapping) else record.args
+            if not all(isinstance(arg, _IMMUTABLE_ARGS) for arg in args):
+                record.msg = record.getMessage()
+                record.args = None
+        if record.exc_info:
+            # Also releases the frames the traceback keeps alive
+            record.exc_text = _EXC_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            if self._unreported:
+                self.queue.put_nowait(self._dropped_record())
+                self._unreported = 0
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            self._unreported += 1
+
+    def _dropped_record(self) -> logging.LogRecord:
+        record = logging.LogRecord(
+            "logging", logging.WARNING, __file__, 0,
+            "Log queue full, dropped %d records", (self._unreported,), None
+        )
+        record.dropped_total = self.dropped
+        return record
+
+
+class TimedRepo:
+    """Proxy that adds the wall time of every awaited repository call to the request's db_ms"""
+
+    def __init__(self, repo):
+        self._repo = repo
+
+    def __getattr__(self, name):
+        attr = getattr(self._repo, name)
+        if not inspect.iscoroutinefunction(attr):
+            return attr
+
+        async def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await attr(*args, **kwargs)
+            finally:
+                ctx = request_context.get()
+                if ctx is not None:
+                    ctx.db_ms += (time.perf_counter() - started) * 1000
+
+        # Cache the wrapper so later lookups skip __getattr__
+        setattr(self, name, timed)
+        return timed
+
+
+async def bind_route(request: Request) -> None:
+    """Router dependency that puts the matched route template on the request context
+    before the handler runs, so records logged by the handler carry it"""
+    ctx = request_context.get()
+    route = request.scope.get("route")
+    if ctx is not None and route is not None:
+        ctx.route = route.path
+
+
+class RequestLoggingMiddleware:
+    """ASGI middleware that opens a request context and writes a sampled access log.
+
+    The request id is taken from X-Request-ID or generated, and echoed in the
+    response. 5xx responses and requests slower than slow_ms are always logged;
+    the rest with probability sample_rate. Unhandled errors are logged and
+    answered with a 500 here, so that response carries the request id too.
+    """
+
+    def __init__(self, app, sample_rate: float = 0.1, slow_ms: float = 500,
+                 logger_name: str = "transportpro.access"):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.logger = logging.getLogger(logger_name)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")
+                break
+        ctx = RequestContext(request_id or uuid.uuid4().hex)
+        token = request_context.set(ctx)
+        status_code = 500
+        response_started = False
+        started = time.perf_counter()
+
+        async def send_with_request_id(message):
+            nonlocal status_code, response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+                status_code = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-request-id", ctx.request_id.encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        except Exception:
+            status_code = 500
+            self._bind_route(scope, ctx)
+            self.logger.exception("Unhandled error on %s %s", scope["method"], scope["path"])
+            # Not re-raised: the server would log the traceback again. If the
+            # response already started, returning makes the server close it.
+            if not response_started:
+                await send_with_request_id({
+                    "type": "http.response.start",
+                    "status": 500,
+                    "headers": [(b"content-type", b"text/plain; charset=utf-8"), (b"content-length", b"21")],
+                })
+                await send({"type": "http.response.body", "body": b"Internal Server Error"})
+        finally:
+            self._bind_route(scope, ctx)
+            duration_ms = (time.perf_counter() - started) * 1000
+            if status_code >= 500 or duration_ms >= self.slow_ms or random.random() < self.sample_rate:
+                self.logger.info(
+                    "%s %s %d",
+                    scope["method"],
+                    scope["path"],
+                    status_code,
+                    extra={
+                        "status": status_code,
+                        "duration_ms": round(duration_ms, 3),
+                        "sample_rate": self.sample_rate,
+                    }
+                )
+            request_context.reset(token)
+
+    @staticmethod
+    def _bind_route(scope, ctx: RequestContext) -> None:
+        route = scope.get("route")
+        if ctx.route is None and route is not None:
+            ctx.route = route.path
+
+
+def instrument_storage(storage) -> None:
+    for name in ("users", "vehicles", "orders"):
+        setattr(storage, name, TimedRepo(getattr(storage, name)))
+
+
+def setup_logging(level: str = "INFO", queue_size: int = 10000, stream=None):
+    """Route the root logger through a bounded queue; returns the queue handler and listener"""
+    log_queue = queue.Queue(maxsize=queue_size)
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter())
+    listener = QueueListener(log_queue, output, respect_handler_level=True)
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    # uvicorn gives its loggers their own stream handlers; send them through the queue too.
+    # Its per-request access line is replaced by RequestLoggingMiddleware.
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        for handler in uvicorn_logger.handlers[:]:
+            uvicorn_logger.removeHandler(handler)
+        uvicorn_logger.propagate = True
+    logging.getLogger("uvicorn.access").disabled = True
+
+    listener.start()
+    return queue_handler, listener
@@ -0,0 +1,599 @@
+"""Storage layer for the TransportPro API.
+
+Routes talk to UserRepo, VehicleRepo and OrderRepo instead of a database
+handle. MotorStorage keeps data in MongoDB; MemoryStorage keeps it in indexed
+dicts so the whole API can run hermetically for tests and load tests.
+"""
+from abc import ABC, abstractmethod
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+STAT_KINDS = ("impressions", "views", "contacts")
+
+
+def _next_day(day: str) -> str:
+    return (date.fromisoformat(day) + timedelta(days=1)).isoformat()
+
+# ============== INTERFACES ==============
+
+class UserRepo(ABC):
+    @abstractmethod
+    async def get(self, user_id: str) -> Optional[dict]: ...
+
+    @abstractmethod
+    async def get_by_email(self, email: str) -> Optional[dict]: ...
+
+    @abstractmethod
+    async def get_many(self, user_ids: Iterable[str]) -> Dict[str, dict]:
+        """Users keyed by id; unknown ids are left out"""
+
+    @abstractmethod
+    async def insert(self, user_doc: dict) -> None: ...
+
+    @abstractmethod
+    async def update(self, user_id: str, fields: dict) -> None: ...
+
+    @abstractmethod
+    async def count(self, user_type: Optional[str] = None) -> int: ...
+
+    async def ensure_indexes(self) -> None:
+        pass
+
+
+class VehicleRepo(ABC):
+    @abstractmethod
+    async def get(self, vehicle_id: str) -> Optional[dict]: ...
+
+    @abstractmethod
+    async def get_many(self, vehicle_ids: List[str]) -> List[dict]: ...
+
+    @abstractmethod
+    async def insert(self, vehicle_doc: dict) -> None: ...
+
+    @abstractmethod
+    async def update(self, vehicle_id: str, fields: dict) -> Optional[dict]:
+        """Apply fields and return the updated vehicle"""
+
+    @abstractmethod
+    async def delete(self, vehicle_id: str, user_id: str) -> bool:
+        """Delete a vehicle owned by user_id; False if there was none"""
+
+    @abstractmethod
+    async def search(
+        self,
+        vehicle_type: Optional[str] = None,
+        min_capacity: Optional[float] = None,
+        min_long_side: Optional[float] = None,
+        min_short_side: Optional[float] = None,
+        min_height: Optional[float] = None,
+        min_seats: Optional[int] = None,
+        sort_by_price: bool = False,
+        offset: int = 0,
+        limit: int = 50
+    ) -> List[dict]:
+        """Available vehicles matching every given minimum. The long and short side
+        minimums are checked against the cargo box in either orientation"""
+
+    @abstractmethod
+    async def list_by_user(self, user_id: str, limit: Optional[int] = None) -> List[dict]: ...
+
+    @abstractmethod
+    async def ids_by_user(self, user_id: str) -> List[str]:
+        """IDs of the user's vehicles, without loading the documents"""
+
+    @abstractmethod
+    async def list_fleet(self) -> List[dict]:
+        """All available cargo vehicles, for the fleet index"""
+
+    @abstractmethod
+    async def count(self, vehicle_type: Optional[str] = None) -> int: ...
+
+    @abstractmethod
+    async def increment_stats(self, counts: Dict[Tuple[str, str], dict]) -> None:
+        """Add counters keyed by (vehicle_id, hour bucket) to the stored totals"""
+
+    @abstractmethod
+    async def stats_by_day(self, vehicle_ids: List[str], since: str) -> List[dict]:
+        """Daily counter sums per vehicle from `since` on, oldest day first"""
+
+    async def ensure_indexes(self) -> None:
+        pass
+
+
+class OrderRepo(ABC):
+    @abstractmethod
+    async def get(self, order_id: str) -> Optional[dict]: ...
+
+    @abstractmethod
+    async def insert(self, order_doc: dict) -> None: ...
+
+    @abstractmethod
+    async def update_status(self, order_id: str, status: str, updated_at: str) -> None: ...
+
+    @abstractmethod
+    async def list_by_user(
+        self,
+        user_id: str,
+        before: Optional[Tuple[str, str]],
+        limit: int
+    ) -> List[dict]:
+        """Orders newest first, strictly older than the (created_at, id) in `before`"""
+
+    @abstractmethod
+    async def has_daily_stats(self) -> bool: ...
+
+    @abstractmethod
+    async def rollup_daily_stats(self, since: Optional[str], updated_at: str) -> None:
+        """Recompute per day and package rollups for every day that has orders
+        created or updated from `since` on; all days when `since` is None"""
+
+    @abstractmethod
+    async def daily_stats(self, since: str) -> List[dict]: ...
+
+    async def ensure_indexes(self) -> None:
+        pass
+
+
+class Storage:
+    users: UserRepo
+    vehicles: VehicleRepo
+    orders: OrderRepo
+
+    async def ensure_indexes(self) -> None:
+        await self.users.ensure_indexes()
+        await self.vehicles.ensure_indexes()
+        await self.orders.ensure_indexes()
+
+    def close(self) -> None:
+        pass
+
+# ============== MONGODB ==============
+
+class MotorUserRepo(UserRepo):
+    def __init__(self, db):
+        self.collection = db.users
+
+    async def get(self, user_id):
+        return await self.collection.find_one({"id": user_id}, {"_id": 0})
+
+    async def get_by_email(self, email):
+        return await self.collection.find_one({"email": email}, {"_id": 0})
+
+    async def get_many(self, user_ids):
+        user_ids = list(set(user_ids))
+        if not user_ids:
+            return {}
+        users = await self.collection.find({"id": {"$in": user_ids}}, {"_id": 0}).to_list(len(user_ids))
+        return {u["id"]: u for u in users}
+
+    async def insert(self, user_doc):
+        await self.collection.insert_one(dict(user_doc))
+
+    async def update(self, user_id, fields):
+        await self.collection.update_one({"id": user_id}, {"$set": fields})
+
+    async def count(self, user_type=None):
+        return await self.collection.count_documents({"user_type": user_type} if user_type else {})
+
+    async def ensure_indexes(self):
+        await self.collection.create_index("id", unique=True)
+        await self.collection.create_index("email", unique=True)
+
+
+class MotorVehicleRepo(VehicleRepo):
+    def __init__(self, db):
+        self.collection = db.vehicles
+        self.stats = db.vehicle_stats
+
+    async def get(self, vehicle_id):
+        return await self.collection.find_one({"id": vehicle_id}, {"_id": 0})
+
+    async def get_many(self, vehicle_ids):
+        if not vehicle_ids:
+            return []
+        return await self.collection.find({"id": {"$in": vehicle_ids}}, {"_id": 0}).to_list(len(vehicle_ids))
+
+    async def insert(self, vehicle_doc):
+        await self.collection.insert_one(dict(vehicle_doc))
+
+    async def update(self, vehicle_id, fields):
+        await self.collection.update_one({"id": vehicle_id}, {"$set": fields})
+        return await self.get(vehicle_id)
+
+    async def delete(self, vehicle_id, user_id):
+        result = await self.collection.delete_one({"id": vehicle_id, "user_id": user_id})
+        return result.deleted_count > 0
+
+    async def search(self, vehicle_type=None, min_capacity=None, min_long_side=None, min_short_side=None,
+                     min_height=None, min_seats=None, sort_by_price=False, offset=0, limit=50):
+        query = {"available": True}
+        if vehicle_type:
+            query["vehicle_type"] = vehicle_type
+        for field, minimum in (
+            ("capacity_tons", min_capacity),
+            ("dimensions_height", min_height),
+            ("passenger_seats", min_seats),
+        ):
+            if minimum:
+                query[field] = {"$gte": minimum}
+        if min_long_side:
+            short_side = min_short_side or 0
+            query["$or"] = [
+                {"dimensions_length": {"$gte": min_long_side}, "dimensions_width": {"$gte": short_side}},
+                {"dimensions_length": {"$gte": short_side}, "dimensions_width": {"$gte": min_long_side}},
+            ]
+
+        cursor = self.collection.find(query, {"_id": 0})
+        if sort_by_price:
+            cursor = cursor.sort("price_per_km", 1)
+        return await cursor.skip(offset).limit(limit).to_list(limit)
+
+    async def list_by_user(self, user_id, limit=None):
+        return await self.collection.find({"user_id": user_id}, {"_id": 0}).to_list(limit)
+
+    async def ids_by_user(self, user_id):
+        vehicles = await self.collection.find({"user_id": user_id}, {"_id": 0, "id": 1}).to_list(None)
+        return [v["id"] for v in vehicles]
+
+    async def list_fleet(self):
+        return await self.collection.find(
+            {"vehicle_type": "cargo", "available": True},
+            {"_id": 0, "id": 1, "vehicle_type": 1, "available": 1, "capacity_tons": 1,
+             "dimensions_length": 1, "dimensions_width": 1, "dimensions_height": 1, "price_per_km": 1}
+        ).to_list(None)
+
+    async def count(self, vehicle_type=None):
+        return await self.collection.count_documents({"vehicle_type": vehicle_type} if vehicle_type else {})
+
+    async def increment_stats(self, counts):
+        operations = [
+            UpdateOne(
+                {"vehicle_id": vehicle_id, "bucket": bucket},
+                {"$inc": counters},
+                upsert=True
+            )
+            for (vehicle_id, bucket), counters in counts.items()
+        ]
+        await self.stats.bulk_write(operations, ordered=False)
+
+    async def stats_by_day(self, vehicle_ids, since):
+        pipeline = [
+            {"$match": {"vehicle_id": {"$in": vehicle_ids}, "bucket": {"$gte": since}}},
+            {"$group": {
+                "_id": {"vehicle_id": "$vehicle_id", "day": {"$substrBytes": ["$bucket", 0, 10]}},
+                **{kind: {"$sum": f"${kind}"} for kind in STAT_KINDS},
+            }},
+            {"$sort": {"_id.day": 1}},
+        ]
+        rows = await self.stats.aggregate(pipeline).to_list(None)
+        return [
+            {"vehicle_id": r["_id"]["vehicle_id"], "day": r["_id"]["day"],
+             **{kind: r[kind] for kind in STAT_KINDS}}
+            for r in rows
+        ]
+
+    async def ensure_indexes(self):
+        await self.collection.create_index("id", unique=True)
+        await self.collection.create_index("user_id")
+        # Quotes sort available vehicles by rate, with or without a type filter
+        await self.collection.create_index([("available", 1), ("price_per_km", 1)])
+        await self.collection.create_index([("available", 1), ("vehicle_type", 1), ("price_per_km", 1)])
+        await self.stats.create_index([("vehicle_id", 1), ("bucket", 1)], unique=True)
+
+
+class MotorOrderRepo(OrderRepo):
+    def __init__(self, db):
+        self.collection = db.orders
+        self.daily = db.order_daily_stats
+
+    async def get(self, order_id):
+        return await self.collection.find_one({"id": order_id}, {"_id": 0})
+
+    async def insert(self, order_doc):
+        await self.collection.insert_one(dict(order_doc))
+
+    async def update_status(self, order_id, status, updated_at):
+        await self.collection.update_one(
+            {"id": order_id},
+            {"$set": {"status": status, "updated_at": updated_at}}
+        )
+
+    async def list_by_user(self, user_id, before, limit):
+        query = {"user_id": user_id}
+        if before:
+            created_at, order_id = before
+            query["$or"] = [
+                {"created_at": {"$lt": created_at}},
+                {"created_at": created_at, "id": {"$lt": order_id}},
+            ]
+        return await self.collection.find(query, {"_id": 0}).sort(
+            [("created_at", -1), ("id", -1)]
+        ).limit(limit).to_list(limit)
+
+    async def has_daily_stats(self):
+        return await self.daily.estimated_document_count() > 0
+
+    async def rollup_daily_stats(self, since, updated_at):
+        match = {}
+        if since:
+            # Late webhook updates change rollups of the day the order was created
+            changed = await self.collection.aggregate([
+                {"$match": {"$or": [{"created_at": {"$gte": since}}, {"updated_at": {"$gte": since}}]}},
+                {"$group": {"_id": {"$substrBytes": ["$created_at", 0, 10]}}},
+            ]).to_list(None)
+            if not changed:
+                return
+            match["$or"] = [
+                {"created_at": {"$gte": r["_id"], "$lt": _next_day(r["_id"])}} for r in changed
+            ]
+
+        pipeline = [
+            {"$match": match},
+            {"$group": {
+                "_id": {"day": {"$substrBytes": ["$created_at", 0, 10]}, "package_id": "$package_id"},
+                "orders": {"$sum": 1},
+                "approved": {"$sum": {"$cond": [{"$eq": ["$status", "approved"]}, 1, 0]}},
+                "pending": {"$sum": {"$cond": [{"$eq": ["$status", "pending"]}, 1, 0]}},
+                "revenue": {"$sum": {"$cond": [{"$eq": ["$status", "approved"]}, "$amount", 0]}},
+            }},
+            {"$project": {
+                "_id": 0,
+                "day": "$_id.day",
+                "package_id": "$_id.package_id",
+                "orders": 1,
+                "approved": 1,
+                "pending": 1,
+                "revenue": 1,
+                "updated_at": {"$literal": updated_at},
+            }},
+            {"$merge": {
+                "into": "order_daily_stats",
+                "on": ["day", "package_id"],
+                "whenMatched": "replace",
+                "whenNotMatched": "insert",
+            }},
+        ]
+        await self.collection.aggregate(pipeline).to_list(None)
+
+    async def daily_stats(self, since):
+        return await self.daily.find({"day": {"$gte": since}}, {"_id": 0}).to_list(None)
+
+    async def ensure_indexes(self):
+        await self.collection.create_index([("user_id", 1), ("created_at", -1), ("id", -1)])
+        await self.collection.create_index("created_at")
+        await self.collection.create_index("updated_at", sparse=True)
+        await self.daily.create_index([("day", 1), ("package_id", 1)], unique=True)
+
+
+class MotorStorage(Storage):
+    def __init__(self, mongo_url: str, db_name: str):
+        self.client = AsyncIOMotorClient(mongo_url)
+        db = self.client[db_name]
+        self.users = MotorUserRepo(db)
+        self.vehicles = MotorVehicleRepo(db)
+        self.orders = MotorOrderRepo(db)
+
+    def close(self):
+        self.client.close()
+
+# ============== IN-MEMORY ==============
+
+def _at_least(value, minimum) -> bool:
+    # Mirrors $gte: documents without the field never match
+    return not minimum or (value is not None and value >= minimum)
+
+
+def _fits_floor(vehicle: dict, min_long_side, min_short_side) -> bool:
+    if not min_long_side:
+        return True
+    length, width = vehicle.get("dimensions_length"), vehicle.get("dimensions_width")
+    if length is None or width is None:
+        return False
+    return max(length, width) >= min_long_side and min(length, width) >= (min_short_side or 0)
+
+
+class MemoryUserRepo(UserRepo):
+    def __init__(self):
+        self._by_id: Dict[str, dict] = {}
+        self._id_by_email: Dict[str, str] = {}
+
+    async def get(self, user_id):
+        user = self._by_id.get(user_id)
+        return dict(user) if user else None
+
+    async def get_by_email(self, email):
+        user_id = self._id_by_email.get(email)
+        return await self.get(user_id) if user_id else None
+
+    async def get_many(self, user_ids):
+        return {i: dict(self._by_id[i]) for i in set(user_ids) if i in self._by_id}
+
+    async def insert(self, user_doc):
+        self._by_id[user_doc["id"]] = dict(user_doc)
+        self._id_by_email[user_doc["email"]] = user_doc["id"]
+
+    async def update(self, user_id, fields):
+        user = self._by_id.get(user_id)
+        if user:
+            user.update(fields)
+
+    async def count(self, user_type=None):
+        if not user_type:
+            return len(self._by_id)
+        return sum(1 for u in self._by_id.values() if u.get("user_type") == user_type)
+
+
+class MemoryVehicleRepo(VehicleRepo):
+    def __init__(self):
+        self._by_id: Dict[str, dict] = {}
+        self._ids_by_user: Dict[str, Dict[str, None]] = {}
+        self._ids_by_type: Dict[str, Dict[str, None]] = {}
+        self._stats: Dict[Tuple[str, str], dict] = {}
+
+    def _index(self, vehicle: dict) -> None:
+        self._ids_by_user.setdefault(vehicle["user_id"], {})[vehicle["id"]] = None
+        self._ids_by_type.setdefault(vehicle["vehicle_type"], {})[vehicle["id"]] = None
+
+    def _unindex(self, vehicle: dict) -> None:
+        self._ids_by_user.get(vehicle["user_id"], {}).pop(vehicle["id"], None)
+        self._ids_by_type.get(vehicle["vehicle_type"], {}).pop(vehicle["id"], None)
+
+    async def get(self, vehicle_id):
+        vehicle = self._by_id.get(vehicle_id)
+        return dict(vehicle) if vehicle else None
+
+    async def get_many(self, vehicle_ids):
+        return [dict(self._by_id[i]) for i in vehicle_ids if i in self._by_id]
+
+    async def insert(self, vehicle_doc):
+        self._by_id[vehicle_doc["id"]] = dict(vehicle_doc)
+        self._index(vehicle_doc)
+
+    async def update(self, vehicle_id, fields):
+        vehicle = self._by_id.get(vehicle_id)
+        if not vehicle:
+            return None
+        # Only re-index on a key change so listings keep their insertion order
+        if fields.get("vehicle_type", vehicle["vehicle_type"]) != vehicle["vehicle_type"]:
+            self._ids_by_type[vehicle["vehicle_type"]].pop(vehicle_id, None)
+            self._ids_by_type.setdefault(fields["vehicle_type"], {})[vehicle_id] = None
+        vehicle.update(fields)
+        return dict(vehicle)
+
+    async def delete(self, vehicle_id, user_id):
+        vehicle = self._by_id.get(vehicle_id)
+        if not vehicle or vehicle["user_id"] != user_id:
+            return False
+        self._unindex(vehicle)
+        del self._by_id[vehicle_id]
+        return True
+
+    async def search(self, vehicle_type=None, min_capacity=None, min_long_side=None, min_short_side=None,
+                     min_height=None, min_seats=None, sort_by_price=False, offset=0, limit=50):
+        if vehicle_type:
+            candidates = (self._by_id[i] for i in self._ids_by_type.get(vehicle_type, {}))
+        else:
+            candidates = self._by_id.values()
+
+        matches = [
+            v for v in candidates
+            if v.get("available")
+            and _at_least(v.get("capacity_tons"), min_capacity)
+            and _fits_floor(v, min_long_side, min_short_side)
+            and _at_least(v.get("dimensions_height"), min_height)
+            and _at_least(v.get("passenger_seats"), min_seats)
+        ]
+        if sort_by_price:
+            matches.sort(key=lambda v: v.get("price_per_km", 0))
+        return [dict(v) for v in matches[offset:offset + limit]]
+
+    async def list_by_user(self, user_id, limit=None):
+        vehicle_ids = list(self._ids_by_user.get(user_id, {}))[:limit]
+        return [dict(self._by_id[i]) for i in vehicle_ids]
+
+    async def ids_by_user(self, user_id):
+        return list(self._ids_by_user.get(user_id, {}))
+
+    async def list_fleet(self):
+        return [
+            dict(self._by_id[i]) for i in self._ids_by_type.get("cargo", {})
+            if self._by_id[i].get("available")
+        ]
+
+    async def count(self, vehicle_type=None):
+        if not vehicle_type:
+            return len(self._by_id)
+        return len(self._ids_by_type.get(vehicle_type, {}))
+
+    async def increment_stats(self, counts):
+        for key, counters in counts.items():
+            totals = self._stats.setdefault(key, dict.fromkeys(STAT_KINDS, 0))
+            for kind, count in counters.items():
+                totals[kind] += count
+
+    async def stats_by_day(self, vehicle_ids, since):
+        wanted = set(vehicle_ids)
+        days: Dict[Tuple[str, str], dict] = {}
+        for (vehicle_id, bucket), counters in self._stats.items():
+            if vehicle_id not in wanted or bucket < since:
+                continue
+            row = days.setdefault((bucket[:10], vehicle_id), dict.fromkeys(STAT_KINDS, 0))
+            for kind in STAT_KINDS:
+                row[kind] += counters[kind]
+        return [
+            {"vehicle_id": vehicle_id, "day": day, **row}
+            for (day, vehicle_id), row in sorted(days.items())
+        ]
+
+
+class MemoryOrderRepo(OrderRepo):
+    def __init__(self):
+        self._by_id: Dict[str, dict] = {}
+        self._ids_by_user: Dict[str, List[str]] = {}
+        self._daily: Dict[Tuple[str, str], dict] = {}
+
+    async def get(self, order_id):
+        order = self._by_id.get(order_id)
+        return dict(order) if order else None
+
+    async def insert(self, order_doc):
+        self._by_id[order_doc["id"]] = dict(order_doc)
+        self._ids_by_user.setdefault(order_doc["user_id"], []).append(order_doc["id"])
+
+    async def update_status(self, order_id, status, updated_at):
+        order = self._by_id.get(order_id)
+        if order:
+            order.update(status=status, updated_at=updated_at)
+
+    async def list_by_user(self, user_id, before, limit):
+        orders = [self._by_id[i] for i in self._ids_by_user.get(user_id, [])]
+        if before:
+            orders = [o for o in orders if (o["created_at"], o["id"]) < before]
+        orders.sort(key=lambda o: (o["created_at"], o["id"]), reverse=True)
+        return [dict(o) for o in orders[:limit]]
+
+    async def has_daily_stats(self):
+        return bool(self._daily)
+
+    async def rollup_daily_stats(self, since, updated_at):
+        days = None
+        if since:
+            days = {
+                o["created_at"][:10] for o in self._by_id.values()
+                if o["created_at"] >= since or o.get("updated_at", "") >= since
+            }
+
+        rollups: Dict[Tuple[str, str], dict] = {}
+        for order in self._by_id.values():
+            if days is not None and order["created_at"][:10] not in days:
+                continue
+            day = order["created_at"][:10]
+            row = rollups.setdefault((day, order["package_id"]), {
+                "day": day,
+                "package_id": order["package_id"],
+                "orders": 0,
+                "approved": 0,
+                "pending": 0,
+                "revenue": 0,
+                "updated_at": updated_at,
+            })
+            row["orders"] += 1
+            if order["status"] == "approved":
+                row["approved"] += 1
+                row["revenue"] += order["amount"]
+            elif order["status"] == "pending":
+                row["pending"] += 1
+        self._daily.update(rollups)
+
+    async def daily_stats(self, since):
+        return [dict(r) for r in self._daily.values() if r["day"] >= since]
+
+
+class MemoryStorage(Storage):
+    def __init__(self):
+        self.users = MemoryUserRepo()
+        self.vehicles = MemoryVehicleRepo()
+        self.orders = MemoryOrderRepo()
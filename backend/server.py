@@ -2,25 +2,40 @@ from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, Query
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import BulkWriteError, PyMongoError
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
 import os
+import asyncio
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, EmailStr, ConfigDict
 from typing import List, Optional
 import uuid
 from datetime import datetime, timezone, timedelta
+from functools import lru_cache
+import base64
 import hashlib
+import heapq
+import time
 import jwt
 import httpx
+import numpy as np
+
+from logging_setup import (
+    RequestLoggingMiddleware, bind_route, instrument_storage, request_context, setup_logging
+)
+from repositories import MemoryStorage, MotorStorage
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# Storage: "mongo" (default) or "memory" for hermetic tests and load tests
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'mongo')
+if STORAGE_BACKEND == 'memory':
+    storage = MemoryStorage()
+else:
+    storage = MotorStorage(os.environ['MONGO_URL'], os.environ['DB_NAME'])
+instrument_storage(storage)
 
 # JWT Configuration
 JWT_SECRET = os.environ.get('JWT_SECRET', 'transportpro-secret-key-2024')
@@ -32,19 +47,34 @@ FONDY_MERCHANT_ID = os.environ.get('FONDY_MERCHANT_ID', '1396424')
 FONDY_MERCHANT_PASSWORD = os.environ.get('FONDY_MERCHANT_PASSWORD', 'test')
 FONDY_API_URL = "https://pay.fondy.eu/api"
 
+# Analytics Configuration
+ORDER_ROLLUP_INTERVAL_MINUTES = int(os.environ.get('ORDER_ROLLUP_INTERVAL_MINUTES', '15'))
+ORDER_ROLLUP_LOOKBACK_DAYS = int(os.environ.get('ORDER_ROLLUP_LOOKBACK_DAYS', '3'))
+FLEET_INDEX_REFRESH_MINUTES = int(os.environ.get('FLEET_INDEX_REFRESH_MINUTES', '5'))
+VEHICLE_STATS_FLUSH_SECONDS = int(os.environ.get('VEHICLE_STATS_FLUSH_SECONDS', '30'))
+VEHICLE_STATS_MAX_KEYS = int(os.environ.get('VEHICLE_STATS_MAX_KEYS', '50000'))
+
+# Vehicle Cache Configuration
+VEHICLE_CACHE_TTL_SECONDS = float(os.environ.get('VEHICLE_CACHE_TTL_SECONDS', '30'))
+VEHICLE_BATCH_MAX_IDS = 300
+
 # Create the main app
 app = FastAPI(title="TransportPro API")
 
 # Create a router with the /api prefix
-api_router = APIRouter(prefix="/api")
+api_router = APIRouter(prefix="/api", dependencies=[Depends(bind_route)])
 
 security = HTTPBearer()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+scheduler = AsyncIOScheduler(timezone="UTC")
+
+# Configure logging: JSON records are formatted and written on a listener thread
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', '10000'))
+ACCESS_LOG_SAMPLE_RATE = float(os.environ.get('ACCESS_LOG_SAMPLE_RATE', '0.1'))
+ACCESS_LOG_SLOW_MS = float(os.environ.get('ACCESS_LOG_SLOW_MS', '500'))
+
+log_queue_handler, log_listener = setup_logging(LOG_LEVEL, LOG_QUEUE_SIZE)
 logger = logging.getLogger(__name__)
 
 # ============== MODELS ==============
@@ -123,6 +153,86 @@ class SubscriptionPackage(BaseModel):
     features_ua: List[str]
     popular: bool = False
 
+class OrderResponse(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str
+    package_id: str
+    amount: int
+    status: str
+    created_at: str
+    updated_at: Optional[str] = None
+
+class OrderHistoryResponse(BaseModel):
+    orders: List[OrderResponse]
+    next_cursor: Optional[str] = None
+
+class RevenueBucket(BaseModel):
+    key: str
+    orders: int
+    approved: int
+    pending: int
+    revenue: int  # in cents (UAH)
+    conversion_rate: float
+
+class RevenueAnalyticsResponse(BaseModel):
+    days: int
+    totals: RevenueBucket
+    by_package: List[RevenueBucket]
+    by_day: List[RevenueBucket]
+
+class VehicleBatchRequest(BaseModel):
+    # The size limit is checked after duplicates are dropped, as for the GET variant
+    ids: List[str] = Field(min_length=1)
+
+class VehicleBatchResponse(BaseModel):
+    vehicles: List[VehicleResponse]
+    missing: List[str]
+
+class VehicleStatsDay(BaseModel):
+    day: str
+    impressions: int
+    views: int
+    contacts: int
+
+class VehicleStatsResponse(BaseModel):
+    vehicle_id: str
+    impressions: int
+    views: int
+    contacts: int
+    by_day: List[VehicleStatsDay]
+
+class ShipmentItem(BaseModel):
+    weight_tons: float = Field(gt=0)
+    length: float = Field(gt=0)
+    width: float = Field(gt=0)
+    height: float = Field(gt=0)
+    quantity: int = Field(default=1, ge=1)
+
+class ShipmentRequest(BaseModel):
+    items: List[ShipmentItem] = Field(min_length=1)
+    limit: int = Field(default=50, ge=1, le=100)
+
+class QuoteRequest(BaseModel):
+    origin: str
+    destination: str
+    vehicle_type: Optional[str] = None  # cargo or passenger
+    cargo_weight_tons: Optional[float] = Field(default=None, gt=0)
+    cargo_length: Optional[float] = Field(default=None, gt=0)
+    cargo_width: Optional[float] = Field(default=None, gt=0)
+    cargo_height: Optional[float] = Field(default=None, gt=0)
+    passengers: Optional[int] = Field(default=None, ge=1)
+    limit: int = Field(default=20, ge=1, le=100)
+
+class VehicleQuote(BaseModel):
+    vehicle: VehicleResponse
+    total_price: float
+
+class QuoteResponse(BaseModel):
+    origin: str
+    destination: str
+    distance_km: float
+    quotes: List[VehicleQuote]
+
 class PaymentCreate(BaseModel):
     package_id: str
 
@@ -154,11 +264,42 @@ def verify_jwt_token(token: str) -> dict:
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     payload = verify_jwt_token(credentials.credentials)
-    user = await db.users.find_one({"id": payload["user_id"]}, {"_id": 0})
+    user = await storage.users.get(payload["user_id"])
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
+    ctx = request_context.get()
+    if ctx is not None:
+        ctx.user_id = user["id"]
     return user
 
+async def get_admin_user(current_user: dict = Depends(get_current_user)):
+    # Set on the user record by an operator; registration never sets it
+    if not current_user.get("is_admin"):
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
+
+async def get_analytics_user(current_user: dict = Depends(get_current_user)):
+    package = next((p for p in DEFAULT_PACKAGES if p["id"] == current_user.get("subscription_package")), None)
+    expires = current_user.get("subscription_expires")
+    if (
+        not current_user.get("subscription_active")
+        or (expires and expires < datetime.now(timezone.utc).isoformat())
+        or not package
+        or not package.get("analytics")
+    ):
+        raise HTTPException(status_code=403, detail="Subscription with analytics required")
+    return current_user
+
+def encode_cursor(created_at: str, item_id: str) -> str:
+    return base64.urlsafe_b64encode(f"{created_at}|{item_id}".encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        created_at, item_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return created_at, item_id
+
 def generate_fondy_signature(params: dict) -> str:
     """Generate SHA1 signature for Fondy"""
     filtered = {k: v for k, v in params.items() if v is not None and v != ''}
@@ -171,7 +312,7 @@ def generate_fondy_signature(params: dict) -> str:
 @api_router.post("/auth/register", response_model=UserResponse)
 async def register(user_data: UserCreate):
     # Check if email exists
-    existing = await db.users.find_one({"email": user_data.email})
+    existing = await storage.users.get_by_email(user_data.email)
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
     
@@ -189,7 +330,7 @@ async def register(user_data: UserCreate):
         "subscription_expires": None
     }
     
-    await db.users.insert_one(user_doc)
+    await storage.users.insert(user_doc)
     
     return UserResponse(
         id=user_id,
@@ -204,7 +345,7 @@ async def register(user_data: UserCreate):
 
 @api_router.post("/auth/login")
 async def login(credentials: UserLogin):
-    user = await db.users.find_one({"email": credentials.email}, {"_id": 0})
+    user = await storage.users.get_by_email(credentials.email)
     if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
@@ -242,6 +383,343 @@ async def get_me(current_user: dict = Depends(get_current_user)):
         subscription_expires=current_user.get("subscription_expires")
     )
 
+# ============== CARGO FIT INDEX ==============
+
+class FleetIndex:
+    """In-memory columnar index of available cargo vehicles.
+
+    Each row holds capacity, cargo box footprint (long and short side), height,
+    volume, floor area and price_per_km so a shipment can be matched against
+    the whole fleet with a handful of vectorized comparisons instead of a
+    database scan. The index only reflects writes made by this process between
+    periodic reloads from storage.
+    """
+
+    COLUMNS = ("capacity_tons", "long_side", "short_side", "height", "volume", "floor_area", "price_per_km")
+
+    def __init__(self, initial_size: int = 1024):
+        self._rows = np.zeros((initial_size, len(self.COLUMNS)), dtype=np.float64)
+        self._ids: List[str] = []
+        self._positions = {}
+        # Writes since start_reload(), vehicle id to document or None for a removal
+        self._changes: Optional[dict] = None
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @staticmethod
+    def _row(vehicle: dict) -> Optional[tuple]:
+        if vehicle.get("vehicle_type") != "cargo" or not vehicle.get("available", True):
+            return None
+        dims = (
+            vehicle.get("dimensions_length"),
+            vehicle.get("dimensions_width"),
+            vehicle.get("dimensions_height"),
+        )
+        if not vehicle.get("capacity_tons") or not all(dims):
+            return None
+        length, width, height = dims
+        return (
+            vehicle["capacity_tons"],
+            max(length, width),
+            min(length, width),
+            height,
+            length * width * height,
+            length * width,
+            vehicle.get("price_per_km", 0),
+        )
+
+    @classmethod
+    def build(cls, vehicles: List[dict]) -> tuple:
+        """Rows and ids of the indexable vehicles among the given documents.
+
+        Touches no index state, so reloads run it in a worker thread.
+        """
+        def column(field):
+            # Missing values become NaN and fail every comparison below
+            return np.array([v.get(field) for v in vehicles], dtype=np.float64).reshape(-1)
+
+        cargo = np.array(
+            [v.get("vehicle_type") == "cargo" and bool(v.get("available", True)) for v in vehicles],
+            dtype=bool
+        ).reshape(-1)
+        capacity = column("capacity_tons")
+        length = column("dimensions_length")
+        width = column("dimensions_width")
+        height = column("dimensions_height")
+        keep = cargo & (capacity > 0) & (length > 0) & (width > 0) & (height > 0)
+
+        rows = np.column_stack((
+            capacity,
+            np.maximum(length, width),
+            np.minimum(length, width),
+            height,
+            length * width * height,
+            length * width,
+            np.nan_to_num(column("price_per_km")),
+        ))[keep]
+        ids = [vehicle["id"] for vehicle, kept in zip(vehicles, keep) if kept]
+        return rows, ids
+
+    def load(self, vehicles: List[dict]) -> None:
+        """Replace the index contents with the given vehicle documents"""
+        self.swap(*self.build(vehicles))
+
+    def start_reload(self) -> None:
+        """Remember writes from now on, so that swapping in a table built from
+        an older storage snapshot does not lose them"""
+        self._changes = {}
+
+    def abort_reload(self) -> None:
+        self._changes = None
+
+    def swap(self, rows: np.ndarray, ids: List[str]) -> None:
+        """Replace the index contents with a built table and replay writes
+        made since start_reload()"""
+        changes, self._changes = self._changes or {}, None
+        self._rows = rows
+        self._ids = ids
+        self._positions = {vehicle_id: i for i, vehicle_id in enumerate(ids)}
+        for vehicle_id, vehicle in changes.items():
+            if vehicle is None:
+                self.remove(vehicle_id)
+            else:
+                self.upsert(vehicle)
+
+    def upsert(self, vehicle: dict) -> None:
+        if self._changes is not None:
+            self._changes[vehicle["id"]] = vehicle
+        row = self._row(vehicle)
+        if row is None:
+            self.remove(vehicle["id"])
+            return
+
+        position = self._positions.get(vehicle["id"])
+        if position is None:
+            position = len(self._ids)
+            if position == len(self._rows):
+                grown = np.zeros((max(2 * position, 1024), len(self.COLUMNS)), dtype=np.float64)
+                grown[:position] = self._rows[:position]
+                self._rows = grown
+            self._ids.append(vehicle["id"])
+            self._positions[vehicle["id"]] = position
+        self._rows[position] = row
+
+    def remove(self, vehicle_id: str) -> None:
+        if self._changes is not None:
+            self._changes[vehicle_id] = None
+        position = self._positions.pop(vehicle_id, None)
+        if position is None:
+            return
+        # Move the last row into the freed slot to keep the arrays dense
+        last = len(self._ids) - 1
+        last_id = self._ids.pop()
+        if position != last:
+            self._rows[position] = self._rows[last]
+            self._ids[position] = last_id
+            self._positions[last_id] = position
+
+    def match(self, weight_tons: float, long_side: float, short_side: float,
+              height: float, volume: float, stacks: List[tuple], limit: int) -> List[str]:
+        """IDs of vehicles that can carry the shipment, cheapest first.
+
+        stacks holds (footprint, height, quantity) per item. Identical items are
+        stacked as high as the vehicle allows and the floor area their stacks
+        cover must fit in the cargo floor. Packing losses between differently
+        sized stacks are not modelled.
+        """
+        rows = self._rows[:len(self._ids)]
+        mask = (
+            (rows[:, 0] >= weight_tons)
+            & (rows[:, 1] >= long_side)
+            & (rows[:, 2] >= short_side)
+            & (rows[:, 3] >= height)
+            & (rows[:, 4] >= volume)
+        )
+        candidates = np.flatnonzero(mask)
+        if len(candidates) and stacks:
+            vehicle_heights = rows[candidates, 3]
+            floor_needed = np.zeros(len(candidates))
+            for footprint, item_height, quantity in stacks:
+                layers = np.maximum(np.floor(vehicle_heights / item_height), 1)
+                floor_needed += footprint * np.ceil(quantity / layers)
+            candidates = candidates[rows[candidates, 5] >= floor_needed]
+        if len(candidates) > limit:
+            prices = rows[candidates, 6]
+            candidates = candidates[np.argpartition(prices, limit - 1)[:limit]]
+        candidates = candidates[np.argsort(rows[candidates, 6], kind="stable")]
+        return [self._ids[i] for i in candidates]
+
+fleet_index = FleetIndex()
+
+async def refresh_fleet_index():
+    """Rebuild the fleet index from storage without blocking the event loop"""
+    fleet_index.start_reload()
+    try:
+        vehicles = await storage.vehicles.list_fleet()
+        rows, ids = await asyncio.to_thread(FleetIndex.build, vehicles)
+    except Exception:
+        fleet_index.abort_reload()
+        raise
+    fleet_index.swap(rows, ids)
+
+def shipment_requirements(items: List[ShipmentItem]) -> tuple:
+    """Reduce a shipment to the minimum weight, footprint, height and volume a vehicle needs,
+    plus the (footprint, height, quantity) of each item for the floor area check"""
+    weight = sum(item.weight_tons * item.quantity for item in items)
+    volume = sum(item.length * item.width * item.height * item.quantity for item in items)
+    # Items may be turned on the floor but are kept upright
+    long_side = max(max(item.length, item.width) for item in items)
+    short_side = max(min(item.length, item.width) for item in items)
+    height = max(item.height for item in items)
+    stacks = [(item.length * item.width, item.height, item.quantity) for item in items]
+    return weight, long_side, short_side, height, volume, stacks
+
+# ============== VEHICLE EVENT BUFFER ==============
+
+class VehicleEventBuffer:
+    """Aggregates vehicle impressions, views and contacts in memory.
+
+    Counters are keyed by (vehicle_id, hour bucket) and written to
+    vehicle_stats with one bulk_write of $inc upserts per flush. The number of
+    keys is capped: past the high watermark a flush is started early, and once
+    the cap is reached events for new keys are dropped and counted.
+    """
+
+    KINDS = ("impressions", "views", "contacts")
+
+    def __init__(self, max_keys: int = 50000, high_watermark: float = 0.8):
+        self.max_keys = max_keys
+        self.high_watermark = int(max_keys * high_watermark)
+        self.dropped = 0
+        self._counts = {}
+        self._flush_lock = asyncio.Lock()
+        self._flush_task = None
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    @staticmethod
+    def current_bucket() -> str:
+        return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H")
+
+    def record(self, kind: str, vehicle_ids: List[str]) -> None:
+        bucket = self.current_bucket()
+        for vehicle_id in vehicle_ids:
+            key = (vehicle_id, bucket)
+            counters = self._counts.get(key)
+            if counters is None:
+                if len(self._counts) >= self.max_keys:
+                    self.dropped += 1
+                    continue
+                counters = self._counts[key] = dict.fromkeys(self.KINDS, 0)
+            counters[kind] += 1
+
+        if len(self._counts) >= self.high_watermark and not self._flush_task:
+            self._flush_task = asyncio.get_running_loop().create_task(self.flush())
+            self._flush_task.add_done_callback(self._flush_done)
+
+    def _flush_done(self, task) -> None:
+        self._flush_task = None
+        # flush() handles storage errors itself; anything else would otherwise go unnoticed
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Vehicle stats flush failed, counters lost", exc_info=task.exception())
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            if not self._counts:
+                return
+            counts, self._counts = self._counts, {}
+            try:
+                await storage.vehicles.increment_stats(counts)
+            except BulkWriteError as e:
+                # Unordered bulk writes apply every operation that is not listed as failed
+                keys = list(counts)
+                failed = [keys[err["index"]] for err in e.details.get("writeErrors", [])]
+                logger.error("Vehicle stats flush failed for %d of %d keys", len(failed), len(counts))
+                self._restore({key: counts[key] for key in failed})
+            except PyMongoError as e:
+                logger.error("Vehicle stats flush failed for %d keys: %s", len(counts), e)
+                self._restore(counts)
+
+    def _restore(self, counts: dict) -> None:
+        """Put unflushed counters back, dropping whatever no longer fits"""
+        for key, counters in counts.items():
+            existing = self._counts.get(key)
+            if existing is None:
+                if len(self._counts) >= self.max_keys:
+                    self.dropped += sum(counters.values())
+                    continue
+                self._counts[key] = counters
+            else:
+                for kind, count in counters.items():
+                    existing[kind] += count
+
+vehicle_events = VehicleEventBuffer(max_keys=VEHICLE_STATS_MAX_KEYS)
+
+# ============== VEHICLE CACHE ==============
+
+class VehicleCache:
+    """Short-lived cache of assembled vehicle responses keyed by vehicle id.
+
+    Shared by the single-item and batch lookup routes. Entries expire after
+    ttl_seconds and the oldest entries are evicted beyond max_size.
+    """
+
+    def __init__(self, ttl_seconds: float, max_size: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries = {}
+
+    def get(self, vehicle_id: str) -> Optional[VehicleResponse]:
+        entry = self._entries.get(vehicle_id)
+        if entry is None:
+            return None
+        expires, vehicle = entry
+        if expires < time.monotonic():
+            del self._entries[vehicle_id]
+            return None
+        return vehicle
+
+    def set(self, vehicle: VehicleResponse) -> None:
+        self._entries.pop(vehicle.id, None)
+        self._entries[vehicle.id] = (time.monotonic() + self.ttl_seconds, vehicle)
+        while len(self._entries) > self.max_size:
+            del self._entries[next(iter(self._entries))]
+
+    def invalidate(self, vehicle_id: str) -> None:
+        self._entries.pop(vehicle_id, None)
+
+vehicle_cache = VehicleCache(ttl_seconds=VEHICLE_CACHE_TTL_SECONDS)
+
+async def load_vehicles(vehicle_ids: List[str]) -> dict:
+    """Resolve vehicle responses by id through the cache, one $in query per collection for misses"""
+    found = {}
+    misses = []
+    for vehicle_id in vehicle_ids:
+        cached = vehicle_cache.get(vehicle_id)
+        if cached is not None:
+            found[vehicle_id] = cached
+        else:
+            misses.append(vehicle_id)
+    if not misses:
+        return found
+
+    vehicles = await storage.vehicles.get_many(misses)
+    drivers_by_id = await storage.users.get_many(v["user_id"] for v in vehicles)
+
+    for v in vehicles:
+        driver = drivers_by_id.get(v["user_id"])
+        vehicle = VehicleResponse(
+            **v,
+            driver_name=driver["name"] if driver else None,
+            driver_phone=driver["phone"] if driver else None,
+            driver_city=driver["city"] if driver else None
+        )
+        vehicle_cache.set(vehicle)
+        found[vehicle.id] = vehicle
+    return found
+
 # ============== VEHICLE ROUTES ==============
 
 @api_router.post("/vehicles", response_model=VehicleResponse)
@@ -270,7 +748,8 @@ async def create_vehicle(vehicle_data: VehicleCreate, current_user: dict = Depen
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     
-    await db.vehicles.insert_one(vehicle_doc)
+    await storage.vehicles.insert(vehicle_doc)
+    fleet_index.upsert(vehicle_doc)
     
     return VehicleResponse(
         **{k: v for k, v in vehicle_doc.items() if k != "_id"},
@@ -288,20 +767,19 @@ async def get_vehicles(
     limit: int = Query(default=50, le=100),
     offset: int = 0
 ):
-    # Build query
-    query = {"available": True}
-    if vehicle_type:
-        query["vehicle_type"] = vehicle_type
-    if min_capacity:
-        query["capacity_tons"] = {"$gte": min_capacity}
+    vehicles = await storage.vehicles.search(
+        vehicle_type=vehicle_type,
+        min_capacity=min_capacity,
+        offset=offset,
+        limit=limit
+    )
     
     # Get vehicles with driver info
-    vehicles = await db.vehicles.find(query, {"_id": 0}).skip(offset).limit(limit).to_list(limit)
+    drivers_by_id = await storage.users.get_many(v["user_id"] for v in vehicles)
     
     result = []
     for v in vehicles:
-        # Get driver info
-        driver = await db.users.find_one({"id": v["user_id"]}, {"_id": 0})
+        driver = drivers_by_id.get(v["user_id"])
         if driver:
             # Filter by city if specified
             if city and city.lower() not in driver.get("city", "").lower():
@@ -317,14 +795,38 @@ async def get_vehicles(
                 driver_city=driver["city"]
             ))
     
+    vehicle_events.record("impressions", [v.id for v in result])
+    return result
+
+@api_router.post("/vehicles/match", response_model=List[VehicleResponse])
+async def match_vehicles(shipment: ShipmentRequest):
+    """Find available cargo vehicles whose capacity, cargo box and floor area fit a shipment"""
+    vehicle_ids = fleet_index.match(*shipment_requirements(shipment.items), limit=shipment.limit)
+    if not vehicle_ids:
+        return []
+
+    vehicles = await storage.vehicles.get_many(vehicle_ids)
+    vehicles_by_id = {v["id"]: v for v in vehicles}
+    drivers_by_id = await storage.users.get_many(v["user_id"] for v in vehicles)
+
+    result = []
+    for vehicle_id in vehicle_ids:
+        v = vehicles_by_id.get(vehicle_id)
+        if not v:
+            continue
+        driver = drivers_by_id.get(v["user_id"])
+        result.append(VehicleResponse(
+            **v,
+            driver_name=driver["name"] if driver else None,
+            driver_phone=driver["phone"] if driver else None,
+            driver_city=driver["city"] if driver else None
+        ))
+    
     return result
 
 @api_router.get("/vehicles/my", response_model=List[VehicleResponse])
 async def get_my_vehicles(current_user: dict = Depends(get_current_user)):
-    vehicles = await db.vehicles.find(
-        {"user_id": current_user["id"]}, 
-        {"_id": 0}
-    ).to_list(100)
+    vehicles = await storage.vehicles.list_by_user(current_user["id"], limit=100)
     
     return [VehicleResponse(
         **v,
@@ -333,20 +835,43 @@ async def get_my_vehicles(current_user: dict = Depends(get_current_user)):
         driver_city=current_user["city"]
     ) for v in vehicles]
 
+async def get_vehicles_batch(vehicle_ids: List[str]) -> VehicleBatchResponse:
+    # Drop duplicates but keep the order the ids were requested in
+    vehicle_ids = list(dict.fromkeys(vehicle_ids))
+    if len(vehicle_ids) > VEHICLE_BATCH_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {VEHICLE_BATCH_MAX_IDS} ids per request")
+
+    found = await load_vehicles(vehicle_ids)
+    return VehicleBatchResponse(
+        vehicles=[found[i] for i in vehicle_ids if i in found],
+        missing=[i for i in vehicle_ids if i not in found]
+    )
+
+@api_router.get("/vehicles/batch", response_model=VehicleBatchResponse)
+async def get_vehicles_batch_by_query(ids: str = Query(..., min_length=1)):
+    return await get_vehicles_batch([i for i in ids.split(",") if i])
+
+@api_router.post("/vehicles/batch", response_model=VehicleBatchResponse)
+async def get_vehicles_batch_by_body(batch: VehicleBatchRequest):
+    return await get_vehicles_batch(batch.ids)
+
 @api_router.get("/vehicles/{vehicle_id}", response_model=VehicleResponse)
 async def get_vehicle(vehicle_id: str):
-    vehicle = await db.vehicles.find_one({"id": vehicle_id}, {"_id": 0})
+    vehicle = (await load_vehicles([vehicle_id])).get(vehicle_id)
     if not vehicle:
         raise HTTPException(status_code=404, detail="Vehicle not found")
     
-    driver = await db.users.find_one({"id": vehicle["user_id"]}, {"_id": 0})
+    vehicle_events.record("views", [vehicle_id])
+    return vehicle
+
+@api_router.post("/vehicles/{vehicle_id}/contact")
+async def record_vehicle_contact(vehicle_id: str):
+    """Record that a customer opened the driver's contact details"""
+    if vehicle_id not in await load_vehicles([vehicle_id]):
+        raise HTTPException(status_code=404, detail="Vehicle not found")
     
-    return VehicleResponse(
-        **vehicle,
-        driver_name=driver["name"] if driver else None,
-        driver_phone=driver["phone"] if driver else None,
-        driver_city=driver["city"] if driver else None
-    )
+    vehicle_events.record("contacts", [vehicle_id])
+    return {"message": "Contact recorded"}
 
 @api_router.put("/vehicles/{vehicle_id}", response_model=VehicleResponse)
 async def update_vehicle(
@@ -354,17 +879,13 @@ async def update_vehicle(
     vehicle_data: VehicleCreate, 
     current_user: dict = Depends(get_current_user)
 ):
-    vehicle = await db.vehicles.find_one({"id": vehicle_id, "user_id": current_user["id"]})
-    if not vehicle:
+    vehicle = await storage.vehicles.get(vehicle_id)
+    if not vehicle or vehicle["user_id"] != current_user["id"]:
         raise HTTPException(status_code=404, detail="Vehicle not found")
     
-    update_data = vehicle_data.model_dump()
-    await db.vehicles.update_one(
-        {"id": vehicle_id},
-        {"$set": update_data}
-    )
-    
-    updated = await db.vehicles.find_one({"id": vehicle_id}, {"_id": 0})
+    updated = await storage.vehicles.update(vehicle_id, vehicle_data.model_dump())
+    fleet_index.upsert(updated)
+    vehicle_cache.invalidate(vehicle_id)
     return VehicleResponse(
         **updated,
         driver_name=current_user["name"],
@@ -374,11 +895,200 @@ async def update_vehicle(
 
 @api_router.delete("/vehicles/{vehicle_id}")
 async def delete_vehicle(vehicle_id: str, current_user: dict = Depends(get_current_user)):
-    result = await db.vehicles.delete_one({"id": vehicle_id, "user_id": current_user["id"]})
-    if result.deleted_count == 0:
+    if not await storage.vehicles.delete(vehicle_id, current_user["id"]):
         raise HTTPException(status_code=404, detail="Vehicle not found")
+    fleet_index.remove(vehicle_id)
+    vehicle_cache.invalidate(vehicle_id)
     return {"message": "Vehicle deleted"}
 
+# ============== ROAD DISTANCES ==============
+
+# Approximate road distances (km) between neighbouring cities. Trips between
+# cities that are not directly connected are routed over this graph.
+ROAD_GRAPH_EDGES = [
+    ("Київ", "Житомир", 140),
+    ("Київ", "Чернігів", 145),
+    ("Київ", "Черкаси", 190),
+    ("Київ", "Вінниця", 270),
+    ("Київ", "Полтава", 340),
+    ("Київ", "Суми", 340),
+    ("Київ", "Умань", 210),
+    ("Житомир", "Рівне", 190),
+    ("Житомир", "Вінниця", 130),
+    ("Рівне", "Луцьк", 70),
+    ("Рівне", "Львів", 210),
+    ("Луцьк", "Львів", 150),
+    ("Вінниця", "Хмельницький", 120),
+    ("Вінниця", "Умань", 160),
+    ("Хмельницький", "Тернопіль", 110),
+    ("Хмельницький", "Чернівці", 190),
+    ("Тернопіль", "Львів", 130),
+    ("Тернопіль", "Івано-Франківськ", 130),
+    ("Львів", "Івано-Франківськ", 135),
+    ("Львів", "Ужгород", 265),
+    ("Івано-Франківськ", "Чернівці", 135),
+    ("Чернігів", "Суми", 330),
+    ("Суми", "Харків", 185),
+    ("Суми", "Полтава", 175),
+    ("Полтава", "Харків", 145),
+    ("Полтава", "Дніпро", 195),
+    ("Харків", "Дніпро", 215),
+    ("Дніпро", "Запоріжжя", 85),
+    ("Черкаси", "Кропивницький", 130),
+    ("Умань", "Кропивницький", 170),
+    ("Умань", "Одеса", 270),
+    ("Кропивницький", "Дніпро", 245),
+    ("Кропивницький", "Миколаїв", 180),
+    ("Одеса", "Миколаїв", 130),
+    ("Миколаїв", "Херсон", 65),
+    ("Херсон", "Запоріжжя", 295),
+]
+
+CITY_ALIASES = {
+    "kyiv": "Київ", "kiev": "Київ", "киев": "Київ",
+    "zhytomyr": "Житомир",
+    "chernihiv": "Чернігів",
+    "cherkasy": "Черкаси",
+    "vinnytsia": "Вінниця",
+    "poltava": "Полтава",
+    "sumy": "Суми",
+    "uman": "Умань",
+    "rivne": "Рівне",
+    "lutsk": "Луцьк",
+    "lviv": "Львів", "львов": "Львів",
+    "khmelnytskyi": "Хмельницький",
+    "ternopil": "Тернопіль",
+    "ivano-frankivsk": "Івано-Франківськ",
+    "uzhhorod": "Ужгород",
+    "chernivtsi": "Чернівці",
+    "kharkiv": "Харків", "харьков": "Харків",
+    "dnipro": "Дніпро", "днепр": "Дніпро",
+    "zaporizhzhia": "Запоріжжя",
+    "kropyvnytskyi": "Кропивницький",
+    "odesa": "Одеса", "odessa": "Одеса", "одесса": "Одеса",
+    "mykolaiv": "Миколаїв",
+    "kherson": "Херсон",
+}
+
+def build_distance_matrix(edges) -> dict:
+    """Precompute shortest road distances between every pair of cities"""
+    graph = {}
+    for a, b, km in edges:
+        graph.setdefault(a, {})[b] = km
+        graph.setdefault(b, {})[a] = km
+
+    matrix = {}
+    for source in graph:
+        distances = {source: 0}
+        heap = [(0, source)]
+        while heap:
+            dist, city = heapq.heappop(heap)
+            if dist > distances[city]:
+                continue
+            for neighbour, km in graph[city].items():
+                candidate = dist + km
+                if candidate < distances.get(neighbour, float("inf")):
+                    distances[neighbour] = candidate
+                    heapq.heappush(heap, (candidate, neighbour))
+        matrix[source] = distances
+    return matrix
+
+DISTANCE_MATRIX = build_distance_matrix(ROAD_GRAPH_EDGES)
+_CITY_LOOKUP = {city.lower(): city for city in DISTANCE_MATRIX}
+_CITY_LOOKUP.update(CITY_ALIASES)
+
+def normalize_city(name: str) -> Optional[str]:
+    return _CITY_LOOKUP.get(name.strip().lower())
+
+@lru_cache(maxsize=4096)
+def get_distance_km(origin: str, destination: str) -> Optional[float]:
+    """Road distance between two normalized city names, or None if there is no route"""
+    return DISTANCE_MATRIX.get(origin, {}).get(destination)
+
+# ============== QUOTE ROUTES ==============
+
+@api_router.post("/quotes", response_model=QuoteResponse)
+async def get_quotes(quote_data: QuoteRequest):
+    origin = normalize_city(quote_data.origin)
+    if not origin:
+        raise HTTPException(status_code=400, detail=f"Unknown city: {quote_data.origin}")
+    destination = normalize_city(quote_data.destination)
+    if not destination:
+        raise HTTPException(status_code=400, detail=f"Unknown city: {quote_data.destination}")
+    if origin == destination:
+        raise HTTPException(status_code=400, detail="Origin and destination must be different cities")
+
+    distance_km = get_distance_km(origin, destination)
+    if distance_km is None:
+        raise HTTPException(status_code=404, detail="Route not found")
+
+    # The cargo may be turned on the floor, so compare long and short sides
+    floor_sides = [side for side in (quote_data.cargo_length, quote_data.cargo_width) if side]
+    # Total price is proportional to price_per_km, so the cheapest rate ranks first
+    vehicles = await storage.vehicles.search(
+        vehicle_type=quote_data.vehicle_type,
+        min_capacity=quote_data.cargo_weight_tons,
+        min_long_side=max(floor_sides, default=None),
+        min_short_side=min(floor_sides, default=None) if len(floor_sides) == 2 else None,
+        min_height=quote_data.cargo_height,
+        min_seats=quote_data.passengers,
+        sort_by_price=True,
+        limit=quote_data.limit
+    )
+    drivers_by_id = await storage.users.get_many(v["user_id"] for v in vehicles)
+
+    quotes = []
+    for v in vehicles:
+        driver = drivers_by_id.get(v["user_id"])
+        quotes.append(VehicleQuote(
+            vehicle=VehicleResponse(
+                **v,
+                driver_name=driver["name"] if driver else None,
+                driver_phone=driver["phone"] if driver else None,
+                driver_city=driver["city"] if driver else None
+            ),
+            total_price=round(v["price_per_km"] * distance_km, 2)
+        ))
+
+    return QuoteResponse(
+        origin=origin,
+        destination=destination,
+        distance_km=distance_km,
+        quotes=quotes
+    )
+
+# ============== VEHICLE ANALYTICS ==============
+
+@api_router.get("/analytics/vehicles", response_model=List[VehicleStatsResponse])
+async def get_vehicle_analytics(
+    days: int = Query(default=30, ge=1, le=366),
+    current_user: dict = Depends(get_analytics_user)
+):
+    """Impression, view and contact counters for the current user's vehicles"""
+    vehicle_ids = await storage.vehicles.ids_by_user(current_user["id"])
+    if not vehicle_ids:
+        return []
+
+    since = (datetime.now(timezone.utc) - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+    rows = await storage.vehicles.stats_by_day(vehicle_ids, since)
+
+    by_vehicle = {vehicle_id: [] for vehicle_id in vehicle_ids}
+    for r in rows:
+        by_vehicle[r["vehicle_id"]].append(VehicleStatsDay(
+            day=r["day"],
+            impressions=r["impressions"],
+            views=r["views"],
+            contacts=r["contacts"]
+        ))
+
+    return [VehicleStatsResponse(
+        vehicle_id=vehicle_id,
+        impressions=sum(d.impressions for d in by_day),
+        views=sum(d.views for d in by_day),
+        contacts=sum(d.contacts for d in by_day),
+        by_day=by_day
+    ) for vehicle_id, by_day in by_vehicle.items()]
+
 # ============== SUBSCRIPTION PACKAGES ==============
 
 DEFAULT_PACKAGES = [
@@ -404,7 +1114,8 @@ DEFAULT_PACKAGES = [
         "duration_days": 30,
         "features": ["5 vehicle listings", "Priority search visibility", "Phone support", "Analytics dashboard"],
         "features_ua": ["5 оголошень", "Пріоритетна видимість", "Телефонна підтримка", "Аналітика"],
-        "popular": True
+        "popular": True,
+        "analytics": True
     },
     {
         "id": "enterprise",
@@ -416,7 +1127,8 @@ DEFAULT_PACKAGES = [
         "duration_days": 30,
         "features": ["Unlimited vehicles", "Top search placement", "24/7 support", "API access", "Custom branding"],
         "features_ua": ["Безліміт оголошень", "Топ пошуку", "Підтримка 24/7", "API доступ", "Власний брендінг"],
-        "popular": False
+        "popular": False,
+        "analytics": True
     }
 ]
 
@@ -457,7 +1169,7 @@ async def create_payment(payment_data: PaymentCreate, current_user: dict = Depen
         "status": "pending",
         "created_at": datetime.now(timezone.utc).isoformat()
     }
-    await db.orders.insert_one(order_doc)
+    await storage.orders.insert(order_doc)
     
     # Request checkout URL from Fondy
     try:
@@ -478,7 +1190,7 @@ async def create_payment(payment_data: PaymentCreate, current_user: dict = Depen
             error_msg = data.get("response", {}).get("error_message", "Payment initialization failed")
             raise HTTPException(status_code=400, detail=error_msg)
     except httpx.RequestError as e:
-        logger.error(f"Fondy request error: {e}")
+        logger.error("Fondy request error: %s", e)
         raise HTTPException(status_code=500, detail="Payment service unavailable")
 
 @api_router.post("/payments/webhook")
@@ -492,46 +1204,112 @@ async def payment_webhook(request_data: dict):
         return {"status": "error", "message": "Missing order_id"}
     
     # Find order
-    order = await db.orders.find_one({"id": order_id})
+    order = await storage.orders.get(order_id)
     if not order:
         return {"status": "error", "message": "Order not found"}
     
     # Update order status
-    await db.orders.update_one(
-        {"id": order_id},
-        {"$set": {"status": order_status, "updated_at": datetime.now(timezone.utc).isoformat()}}
-    )
+    await storage.orders.update_status(order_id, order_status, datetime.now(timezone.utc).isoformat())
     
     # If approved, activate subscription
     if order_status == "approved":
         package = next((p for p in DEFAULT_PACKAGES if p["id"] == order["package_id"]), None)
         if package:
             expires = datetime.now(timezone.utc) + timedelta(days=package["duration_days"])
-            await db.users.update_one(
-                {"id": order["user_id"]},
-                {"$set": {
-                    "subscription_active": True,
-                    "subscription_expires": expires.isoformat(),
-                    "subscription_package": package["id"]
-                }}
-            )
+            await storage.users.update(order["user_id"], {
+                "subscription_active": True,
+                "subscription_expires": expires.isoformat(),
+                "subscription_package": package["id"]
+            })
     
     return {"status": "success"}
 
+# ============== ORDER ROUTES ==============
+
+@api_router.get("/orders/my", response_model=OrderHistoryResponse)
+async def get_my_orders(
+    cursor: Optional[str] = None,
+    limit: int = Query(default=20, ge=1, le=100),
+    current_user: dict = Depends(get_current_user)
+):
+    # Newest first; the cursor is the (created_at, id) of the last order on the previous page
+    before = decode_cursor(cursor) if cursor else None
+    orders = await storage.orders.list_by_user(current_user["id"], before, limit + 1)
+
+    next_cursor = None
+    if len(orders) > limit:
+        orders = orders[:limit]
+        next_cursor = encode_cursor(orders[-1]["created_at"], orders[-1]["id"])
+
+    return OrderHistoryResponse(
+        orders=[OrderResponse(**o) for o in orders],
+        next_cursor=next_cursor
+    )
+
+# ============== REVENUE ANALYTICS ==============
+
+async def rollup_order_stats(lookback_days: int = ORDER_ROLLUP_LOOKBACK_DAYS):
+    """Recompute the daily per-package order rollups.
+
+    Only days with orders created or updated (by the payment webhook) in the
+    trailing lookback window are recomputed. The first run backfills all days.
+    """
+    since = None
+    if await storage.orders.has_daily_stats():
+        since = (datetime.now(timezone.utc) - timedelta(days=lookback_days)).date().isoformat()
+    await storage.orders.rollup_daily_stats(since, datetime.now(timezone.utc).isoformat())
+
+def revenue_bucket(key: str, rows: List[dict]) -> RevenueBucket:
+    orders = sum(r["orders"] for r in rows)
+    approved = sum(r["approved"] for r in rows)
+    return RevenueBucket(
+        key=key,
+        orders=orders,
+        approved=approved,
+        pending=sum(r["pending"] for r in rows),
+        revenue=sum(r["revenue"] for r in rows),
+        conversion_rate=round(approved / orders, 4) if orders else 0.0
+    )
+
+@api_router.get("/admin/analytics/revenue", response_model=RevenueAnalyticsResponse)
+async def get_revenue_analytics(
+    days: int = Query(default=30, ge=1, le=366),
+    admin_user: dict = Depends(get_admin_user)
+):
+    """Revenue and conversion analytics, served from the daily rollups"""
+    since = (datetime.now(timezone.utc) - timedelta(days=days - 1)).date().isoformat()
+    rows = await storage.orders.daily_stats(since)
+
+    by_package = {}
+    by_day = {}
+    for r in rows:
+        by_package.setdefault(r["package_id"], []).append(r)
+        by_day.setdefault(r["day"], []).append(r)
+
+    return RevenueAnalyticsResponse(
+        days=days,
+        totals=revenue_bucket("total", rows),
+        by_package=[revenue_bucket(k, v) for k, v in sorted(by_package.items())],
+        by_day=[revenue_bucket(k, v) for k, v in sorted(by_day.items())]
+    )
+
+@api_router.post("/admin/analytics/rollup")
+async def run_revenue_rollup(admin_user: dict = Depends(get_admin_user)):
+    """Refresh the daily rollups now instead of waiting for the scheduler"""
+    await rollup_order_stats()
+    return {"message": "Rollup completed"}
+
 # ============== DEMO ACTIVATION ==============
 
 @api_router.post("/demo/activate-subscription")
 async def demo_activate(current_user: dict = Depends(get_current_user)):
     """Demo endpoint to activate subscription without payment (for testing)"""
     expires = datetime.now(timezone.utc) + timedelta(days=30)
-    await db.users.update_one(
-        {"id": current_user["id"]},
-        {"$set": {
-            "subscription_active": True,
-            "subscription_expires": expires.isoformat(),
-            "subscription_package": "professional"
-        }}
-    )
+    await storage.users.update(current_user["id"], {
+        "subscription_active": True,
+        "subscription_expires": expires.isoformat(),
+        "subscription_package": "professional"
+    })
     return {"message": "Demo subscription activated", "expires": expires.isoformat()}
 
 # ============== STATISTICS ==============
@@ -539,10 +1317,10 @@ async def demo_activate(current_user: dict = Depends(get_current_user)):
 @api_router.get("/stats")
 async def get_stats():
     """Get platform statistics"""
-    drivers_count = await db.users.count_documents({"user_type": "driver"})
-    vehicles_count = await db.vehicles.count_documents({})
-    cargo_count = await db.vehicles.count_documents({"vehicle_type": "cargo"})
-    passenger_count = await db.vehicles.count_documents({"vehicle_type": "passenger"})
+    drivers_count = await storage.users.count(user_type="driver")
+    vehicles_count = await storage.vehicles.count()
+    cargo_count = await storage.vehicles.count(vehicle_type="cargo")
+    passenger_count = await storage.vehicles.count(vehicle_type="passenger")
     
     return {
         "drivers": drivers_count,
@@ -568,6 +1346,60 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(
+    RequestLoggingMiddleware,
+    sample_rate=ACCESS_LOG_SAMPLE_RATE,
+    slow_ms=ACCESS_LOG_SLOW_MS
+)
+
+@app.on_event("startup")
+async def create_indexes():
+    await storage.ensure_indexes()
+
+@app.on_event("startup")
+async def load_fleet_index():
+    await refresh_fleet_index()
+    logger.info("Fleet index loaded with %d cargo vehicles", len(fleet_index))
+    # Other workers write to storage too, so resync from it periodically
+    scheduler.add_job(
+        refresh_fleet_index,
+        "interval",
+        minutes=FLEET_INDEX_REFRESH_MINUTES,
+        id="fleet_index_refresh",
+        max_instances=1,
+        coalesce=True
+    )
+
+@app.on_event("startup")
+async def start_order_rollups():
+    scheduler.add_job(
+        rollup_order_stats,
+        "interval",
+        minutes=ORDER_ROLLUP_INTERVAL_MINUTES,
+        id="order_rollup",
+        next_run_time=datetime.now(timezone.utc),
+        max_instances=1,
+        coalesce=True
+    )
+    scheduler.start()
+
+@app.on_event("startup")
+async def start_vehicle_stats_flush():
+    scheduler.add_job(
+        vehicle_events.flush,
+        "interval",
+        seconds=VEHICLE_STATS_FLUSH_SECONDS,
+        id="vehicle_stats_flush",
+        max_instances=1,
+        coalesce=True
+    )
+
 @app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
+async def shutdown_storage():
+    if scheduler.running:
+        scheduler.shutdown(wait=False)
+    await vehicle_events.flush()
+    storage.close()
+    if log_queue_handler.dropped:
+        logger.warning("Dropped %d log records since startup", log_queue_handler.dropped)
+    log_listener.stop()
@@ -177,6 +177,15 @@ class TransportProAPITester:
         
         return self.run_test("Get My Vehicles", "GET", "vehicles/my", 200)
 
+    def test_get_vehicles_batch(self):
+        """Test batch vehicle lookup"""
+        vehicle_ids = [getattr(self, 'vehicle_id', None) or "missing-id", "missing-id"]
+        success, response = self.run_test("Get Vehicles Batch", "GET", f"vehicles/batch?ids={','.join(vehicle_ids)}", 200)
+        if success and "missing-id" not in response.get("missing", []):
+            self.log_test("Get Vehicles Batch Missing IDs", False, "missing-id not reported")
+            return False, response
+        return success, response
+
     def test_search_cargo_vehicles(self):
         """Test searching cargo vehicles"""
         return self.run_test("Search Cargo Vehicles", "GET", "vehicles?vehicle_type=cargo", 200)
@@ -189,6 +198,69 @@ class TransportProAPITester:
         """Test searching vehicles by city"""
         return self.run_test("Search Vehicles by City", "GET", "vehicles?city=Київ", 200)
 
+    def test_get_my_orders(self):
+        """Test order history"""
+        if not self.token:
+            self.log_test("Get My Orders", False, "No token available")
+            return False, {}
+        
+        return self.run_test("Get My Orders", "GET", "orders/my?limit=10", 200)
+
+    def test_revenue_analytics_forbidden(self):
+        """Test revenue analytics is admin only"""
+        if not self.token:
+            self.log_test("Revenue Analytics Forbidden", False, "No token available")
+            return False, {}
+        
+        return self.run_test("Revenue Analytics Forbidden", "GET", "admin/analytics/revenue", 403)
+
+    def test_vehicle_analytics(self):
+        """Test per-vehicle impression and view counters"""
+        if not self.token:
+            self.log_test("Vehicle Analytics", False, "No token available")
+            return False, {}
+        
+        return self.run_test("Vehicle Analytics", "GET", "analytics/vehicles?days=7", 200)
+
+    def test_match_vehicles(self):
+        """Test cargo fit matching"""
+        shipment = {
+            "items": [
+                {"weight_tons": 0.8, "length": 1.2, "width": 0.8, "height": 1.5, "quantity": 10},
+                {"weight_tons": 2.0, "length": 6.0, "width": 2.2, "height": 2.5}
+            ]
+        }
+        return self.run_test("Match Vehicles", "POST", "vehicles/match", 200, shipment)
+
+    def test_trip_quotes(self):
+        """Test trip price quotes"""
+        quote_data = {
+            "origin": "Київ",
+            "destination": "Львів",
+            "vehicle_type": "cargo",
+            "cargo_weight_tons": 5.0
+        }
+        success, response = self.run_test("Trip Quotes", "POST", "quotes", 200, quote_data)
+        if success:
+            prices = [q["total_price"] for q in response.get("quotes", [])]
+            if response.get("distance_km") != 540:
+                self.log_test("Trip Quotes Distance", False, f"Expected 540 km, got {response.get('distance_km')}")
+                return False, response
+            if prices != sorted(prices):
+                self.log_test("Trip Quotes Order", False, f"Prices not ascending: {prices}")
+                return False, response
+        return success, response
+
+    def test_trip_quotes_same_city(self):
+        """Test trip price quotes within one city"""
+        quote_data = {"origin": "kyiv", "destination": "Київ"}
+        return self.run_test("Trip Quotes Same City", "POST", "quotes", 400, quote_data)
+
+    def test_trip_quotes_unknown_city(self):
+        """Test trip price quotes for an unknown city"""
+        quote_data = {"origin": "Atlantis", "destination": "Київ"}
+        return self.run_test("Trip Quotes Unknown City", "POST", "quotes", 400, quote_data)
+
     def run_all_tests(self):
         """Run all API tests"""
         print("🚀 Starting TransportPro API Tests")
@@ -211,12 +283,26 @@ class TransportProAPITester:
         self.test_add_vehicle()
         self.test_get_vehicles()
         self.test_get_my_vehicles()
+        self.test_get_vehicles_batch()
         
         # Search functionality
         self.test_search_cargo_vehicles()
         self.test_search_passenger_vehicles()
         self.test_search_vehicles_by_city()
         
+        # Orders and analytics
+        self.test_get_my_orders()
+        self.test_revenue_analytics_forbidden()
+        self.test_vehicle_analytics()
+        
+        # Cargo matching
+        self.test_match_vehicles()
+        
+        # Quotes
+        self.test_trip_quotes()
+        self.test_trip_quotes_unknown_city()
+        self.test_trip_quotes_same_city()
+        
         # Print summary
         print("\n" + "=" * 50)
         print(f"📊 Test Summary: {self.tests_passed}/{self.tests_run} tests passed")
@@ -229,7 +315,8 @@ class TransportProAPITester:
             return 1
 
 def main():
-    tester = TransportProAPITester()
+    # Optional base URL, e.g. a local server started with STORAGE_BACKEND=memory
+    tester = TransportProAPITester(*sys.argv[1:2])
     return tester.run_all_tests()
 
 if __name__ == "__main__":
@@ -0,0 +1,77 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# Run the API hermetically on the in-memory storage engine
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ.setdefault("ACCESS_LOG_SAMPLE_RATE", "0")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import server  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(server.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def register(client):
+    """Register a user and return auth headers plus the user"""
+    counter = {"n": 0}
+
+    def _register(user_type="driver", email=None, city="Київ"):
+        counter["n"] += 1
+        email = email or f"{user_type}_{os.urandom(4).hex()}@example.com"
+        response = client.post("/api/auth/register", json={
+            "email": email,
+            "password": "secret123",
+            "name": f"User {counter['n']}",
+            "phone": "+380501234567",
+            "city": city,
+            "user_type": user_type,
+        })
+        assert response.status_code == 200, response.text
+        login = client.post("/api/auth/login", json={"email": email, "password": "secret123"})
+        assert login.status_code == 200, login.text
+        return {"Authorization": f"Bearer {login.json()['token']}"}, login.json()["user"]
+
+    return _register
+
+
+@pytest.fixture
+def driver(client, register):
+    """Driver with an active demo (professional) subscription"""
+    headers, user = register()
+    assert client.post("/api/demo/activate-subscription", headers=headers).status_code == 200
+    return headers, user
+
+
+def vehicle_payload(**overrides):
+    payload = {
+        "vehicle_type": "cargo",
+        "brand": "Mercedes",
+        "model": "Actros",
+        "year": 2020,
+        "capacity_tons": 20.0,
+        "dimensions_length": 13.6,
+        "dimensions_width": 2.5,
+        "dimensions_height": 3.0,
+        "description": "Test truck",
+        "price_per_km": 15.5,
+        "available": True,
+        "images": [],
+    }
+    payload.update(overrides)
+    return payload
+
+
+def create_vehicle(client, headers, **overrides):
+    response = client.post("/api/vehicles", json=vehicle_payload(**overrides), headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
@@ -0,0 +1,78 @@
+from tests.conftest import create_vehicle, vehicle_payload
+
+
+def test_register_login_and_me(client, register):
+    headers, user = register(email="someone@example.com")
+    me = client.get("/api/auth/me", headers=headers)
+    assert me.status_code == 200
+    assert me.json()["email"] == "someone@example.com"
+    assert me.json()["subscription_active"] is False
+
+
+def test_register_duplicate_email(client, register):
+    register(email="dup@example.com")
+    response = client.post("/api/auth/register", json={
+        "email": "dup@example.com", "password": "x", "name": "N", "phone": "1", "city": "Київ"
+    })
+    assert response.status_code == 400
+
+
+def test_login_wrong_password(client, register):
+    register(email="wrong@example.com")
+    response = client.post("/api/auth/login", json={"email": "wrong@example.com", "password": "nope"})
+    assert response.status_code == 401
+
+
+def test_create_vehicle_requires_subscription(client, register):
+    headers, _ = register()
+    response = client.post("/api/vehicles", json=vehicle_payload(), headers=headers)
+    assert response.status_code == 403
+
+
+def test_vehicle_crud(client, driver, register):
+    headers, user = driver
+    vehicle = create_vehicle(client, headers, brand="Volvo")
+    assert vehicle["driver_name"] == user["name"]
+
+    assert client.get(f"/api/vehicles/{vehicle['id']}").json()["brand"] == "Volvo"
+    assert [v["id"] for v in client.get("/api/vehicles/my", headers=headers).json()] == [vehicle["id"]]
+
+    updated = client.put(
+        f"/api/vehicles/{vehicle['id']}",
+        json=vehicle_payload(brand="DAF", price_per_km=9.0),
+        headers=headers
+    )
+    assert updated.status_code == 200
+    # The single-item cache is invalidated by the update
+    assert client.get(f"/api/vehicles/{vehicle['id']}").json()["brand"] == "DAF"
+
+    other_headers, _ = register()
+    assert client.delete(f"/api/vehicles/{vehicle['id']}", headers=other_headers).status_code == 404
+    assert client.delete(f"/api/vehicles/{vehicle['id']}", headers=headers).status_code == 200
+    assert client.get(f"/api/vehicles/{vehicle['id']}").status_code == 404
+
+
+def test_search_vehicles(client, register):
+    headers, _ = register(city="Харків")
+    client.post("/api/demo/activate-subscription", headers=headers)
+    small = create_vehicle(client, headers, capacity_tons=1.5, price_per_km=7.0)
+    big = create_vehicle(client, headers, capacity_tons=40.0, price_per_km=70.0)
+    bus = create_vehicle(client, headers, vehicle_type="passenger", capacity_tons=None, passenger_seats=20)
+
+    ids = {v["id"] for v in client.get("/api/vehicles?city=Харків&limit=100").json()}
+    assert {small["id"], big["id"], bus["id"]} <= ids
+
+    ids = {v["id"] for v in client.get("/api/vehicles?city=Харків&min_capacity=30&limit=100").json()}
+    assert big["id"] in ids and small["id"] not in ids
+
+    ids = {v["id"] for v in client.get("/api/vehicles?city=Харків&vehicle_type=passenger&limit=100").json()}
+    assert ids == {bus["id"]}
+
+    ids = {v["id"] for v in client.get("/api/vehicles?city=Харків&max_price=10&limit=100").json()}
+    assert small["id"] in ids and big["id"] not in ids
+
+
+def test_stats(client):
+    body = client.get("/api/stats").json()
+    assert set(body) == {"drivers", "vehicles", "cargo_vehicles", "passenger_vehicles"}
+    assert body["vehicles"] == body["cargo_vehicles"] + body["passenger_vehicles"]
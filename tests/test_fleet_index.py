@@ -0,0 +1,80 @@
+import server
+from server import FleetIndex, ShipmentItem, shipment_requirements
+from tests.conftest import create_vehicle
+
+
+def truck(vehicle_id, **overrides):
+    vehicle = {
+        "id": vehicle_id,
+        "vehicle_type": "cargo",
+        "available": True,
+        "capacity_tons": 20.0,
+        "dimensions_length": 13.6,
+        "dimensions_width": 2.5,
+        "dimensions_height": 3.0,
+        "price_per_km": 10.0,
+    }
+    vehicle.update(overrides)
+    return vehicle
+
+
+def match_all(index, **item):
+    item = {"weight_tons": 1, "length": 1, "width": 1, "height": 1, **item}
+    return index.match(*shipment_requirements([ShipmentItem(**item)]), limit=100)
+
+
+def test_match_vehicles_checks_floor_area(client, driver):
+    headers, _ = driver
+    van = create_vehicle(client, headers, capacity_tons=10.0, dimensions_length=3.0,
+                         dimensions_width=2.0, dimensions_height=2.5, price_per_km=1.0)
+    pallets = {"items": [{"weight_tons": 0.8, "length": 1.2, "width": 0.8, "height": 1.5, "quantity": 10}]}
+    ids = [v["id"] for v in client.post("/api/vehicles/match", json=pallets).json()]
+    assert van["id"] not in ids
+
+    pallets["items"][0]["quantity"] = 6
+    ids = [v["id"] for v in client.post("/api/vehicles/match", json=pallets).json()]
+    assert van["id"] in ids
+
+
+def test_build_matches_upserts():
+    fleet = [
+        truck("a", price_per_km=3.0),
+        truck("b", dimensions_length=2.8, dimensions_width=6.0, price_per_km=1.0),
+        truck("no-capacity", capacity_tons=None),
+        truck("bus", vehicle_type="passenger"),
+        truck("parked", available=False),
+    ]
+    loaded = FleetIndex()
+    loaded.load(fleet)
+    upserted = FleetIndex()
+    for vehicle in fleet:
+        upserted.upsert(vehicle)
+
+    assert match_all(loaded) == match_all(upserted) == ["b", "a"]
+    assert match_all(loaded, length=2.7, width=5.0) == match_all(upserted, length=2.7, width=5.0) == ["b"]
+
+
+def test_reload_keeps_writes_made_while_loading():
+    index = FleetIndex()
+    index.load([truck("a"), truck("b")])
+
+    index.start_reload()
+    snapshot = [truck("a"), truck("b")]
+    index.upsert(truck("new", price_per_km=1.0))
+    index.upsert(truck("a", capacity_tons=1.0))
+    index.remove("b")
+    index.swap(*FleetIndex.build(snapshot))
+
+    assert match_all(index) == ["new", "a"]
+    assert match_all(index, weight_tons=5) == ["new"]
+    # Writes after the swap are no longer recorded for replay
+    index.upsert(truck("later"))
+    assert index._changes is None
+
+
+def test_refresh_runs_against_storage(client, driver):
+    headers, _ = driver
+    vehicle = create_vehicle(client, headers, price_per_km=0.5)
+    server.fleet_index.remove(vehicle["id"])
+    client.portal.call(server.refresh_fleet_index)
+    assert vehicle["id"] in match_all(server.fleet_index)
@@ -0,0 +1,150 @@
+import asyncio
+import json
+import logging
+import queue
+
+import pytest
+from fastapi import APIRouter, Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from logging_setup import (
+    ContextFilter,
+    DroppingQueueHandler,
+    JsonFormatter,
+    RequestLoggingMiddleware,
+    TimedRepo,
+    bind_route,
+    request_context,
+)
+from repositories import MemoryUserRepo
+
+
+def make_record(msg, *args, exc_info=None):
+    return logging.LogRecord("test", logging.INFO, __file__, 1, msg, args, exc_info)
+
+
+def make_app(sample_rate=0.0, slow_ms=50):
+    users = TimedRepo(MemoryUserRepo())
+    router = APIRouter(dependencies=[Depends(bind_route)])
+
+    @router.get("/items/{item_id}")
+    async def get_item(item_id: str):
+        request_context.get().user_id = "user-1"
+        await users.get("user-1")
+        logging.getLogger("test.handler").info("handled %s", item_id)
+        return {"id": item_id}
+
+    @router.get("/slow")
+    async def slow():
+        await asyncio.sleep(slow_ms / 1000 + 0.01)
+        return {}
+
+    @router.get("/boom")
+    async def boom():
+        raise RuntimeError("boom")
+
+    app = FastAPI()
+    app.include_router(router)
+    app.add_middleware(RequestLoggingMiddleware, sample_rate=sample_rate, slow_ms=slow_ms)
+    return app
+
+
+@pytest.fixture
+def records():
+    """Records reaching the root logger, with the request context applied"""
+    collected = []
+    handler = logging.Handler()
+    handler.emit = collected.append
+    handler.addFilter(ContextFilter())
+    root = logging.getLogger()
+    root.addHandler(handler)
+    yield collected
+    root.removeHandler(handler)
+
+
+def access_records(records):
+    return [r for r in records if r.name == "transportpro.access" and r.levelno == logging.INFO]
+
+
+def test_dropping_queue_handler_counts_and_reports_drops():
+    log_queue = queue.Queue(maxsize=2)
+    handler = DroppingQueueHandler(log_queue)
+    for i in range(5):
+        handler.handle(make_record("record %d", i))
+    assert handler.dropped == 3
+
+    log_queue.get_nowait()
+    log_queue.get_nowait()
+    handler.handle(make_record("after"))
+    report, after = log_queue.get_nowait(), log_queue.get_nowait()
+    assert report.getMessage() == "Log queue full, dropped 3 records"
+    assert report.levelno == logging.WARNING
+    assert report.dropped_total == 3
+    assert after.getMessage() == "after"
+
+    # Drops are reported once
+    handler.handle(make_record("again"))
+    assert log_queue.get_nowait().getMessage() == "again"
+
+
+def test_prepare_snapshots_mutable_args_and_tracebacks():
+    handler = DroppingQueueHandler(queue.Queue())
+    cities = ["Київ"]
+    prepared = handler.prepare(make_record("cities %s", cities))
+    cities.append("Львів")
+    assert prepared.getMessage() == "cities ['Київ']"
+
+    scalars = handler.prepare(make_record("%s took %d ms", "flush", 3))
+    assert scalars.args == ("flush", 3)
+
+    try:
+        raise ValueError("bad value")
+    except ValueError as e:
+        record = make_record("failed", exc_info=(type(e), e, e.__traceback__))
+    prepared = handler.prepare(record)
+    assert prepared.exc_info is None
+    assert record.exc_info is not None
+    assert "ValueError: bad value" in json.loads(JsonFormatter().format(prepared))["exc_info"]
+
+
+def test_json_records_carry_request_context(records):
+    with TestClient(make_app()) as client:
+        response = client.get("/items/42", headers={"X-Request-ID": "req-1"})
+        generated = client.get("/items/43")
+
+    assert response.headers["x-request-id"] == "req-1"
+    assert len(generated.headers["x-request-id"]) == 32
+
+    handled = [r for r in records if r.name == "test.handler"]
+    entry = json.loads(JsonFormatter().format(handled[0]))
+    assert entry["message"] == "handled 42"
+    assert entry["request_id"] == "req-1"
+    assert entry["route"] == "/items/{item_id}"
+    assert entry["user_id"] == "user-1"
+    assert entry["db_ms"] >= 0
+    assert handled[1].request_id == generated.headers["x-request-id"]
+
+
+def test_access_log_sampling(records):
+    with TestClient(make_app(sample_rate=0.0, slow_ms=50)) as client:
+        client.get("/items/1")
+        assert access_records(records) == []
+
+        client.get("/slow")
+        [slow] = access_records(records)
+        assert slow.status == 200 and slow.duration_ms >= 50
+
+        response = client.get("/boom", headers={"X-Request-ID": "req-boom"})
+
+    assert response.status_code == 500
+    assert response.headers["x-request-id"] == "req-boom"
+    errors = [r for r in records if r.levelno == logging.ERROR]
+    assert len(errors) == 1
+    assert errors[0].route == "/boom" and errors[0].request_id == "req-boom"
+    assert access_records(records)[-1].status == 500
+
+    records.clear()
+    with TestClient(make_app(sample_rate=1.0)) as client:
+        client.get("/items/1")
+    [access] = access_records(records)
+    assert json.loads(JsonFormatter().format(access))["route"] == "/items/{item_id}"
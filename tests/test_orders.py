@@ -0,0 +1,105 @@
+import asyncio
+
+import server
+from repositories import MemoryStorage
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def order(order_id, created_at, status="pending", package_id="basic", amount=100):
+    return {
+        "id": order_id,
+        "user_id": "u1",
+        "package_id": package_id,
+        "amount": amount,
+        "status": status,
+        "created_at": created_at,
+    }
+
+
+def insert_orders(user_id, count, package_id="basic", day="2026-10-01"):
+    for i in range(count):
+        run(server.storage.orders.insert({
+            "id": f"order_{user_id[:8]}_{i:02d}",
+            "user_id": user_id,
+            "package_id": package_id,
+            "amount": 29900,
+            "status": "pending",
+            "created_at": f"{day}T{i:02d}:00:00+00:00",
+        }))
+
+
+def test_order_history_pagination(client, register):
+    headers, user = register()
+    insert_orders(user["id"], 5)
+
+    seen = []
+    cursor = None
+    while True:
+        url = "/api/orders/my?limit=2" + (f"&cursor={cursor}" if cursor else "")
+        page = client.get(url, headers=headers).json()
+        seen += [o["id"] for o in page["orders"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert seen == [f"order_{user['id'][:8]}_{i:02d}" for i in reversed(range(5))]
+
+    assert client.get("/api/orders/my?cursor=garbage", headers=headers).status_code == 400
+
+
+def test_revenue_analytics(client, register):
+    admin_headers, admin = register()
+    run(server.storage.users.update(admin["id"], {"is_admin": True}))
+    headers, user = register()
+    assert client.get("/api/admin/analytics/revenue", headers=headers).status_code == 403
+
+    today = server.datetime.now(server.timezone.utc).date().isoformat()
+    insert_orders(user["id"], 4, package_id="enterprise", day=today)
+    webhook = {"response": {"order_id": f"order_{user['id'][:8]}_01", "order_status": "approved"}}
+    assert client.post("/api/payments/webhook", json=webhook).json() == {"status": "success"}
+    assert client.get("/api/auth/me", headers=headers).json()["subscription_active"] is True
+
+    assert client.post("/api/admin/analytics/rollup", headers=admin_headers).status_code == 200
+    body = client.get("/api/admin/analytics/revenue?days=1", headers=admin_headers).json()
+    enterprise = next(b for b in body["by_package"] if b["key"] == "enterprise")
+    assert (enterprise["orders"], enterprise["approved"], enterprise["pending"]) == (4, 1, 3)
+    assert enterprise["revenue"] == 29900
+    assert enterprise["conversion_rate"] == 0.25
+
+
+def test_registering_gives_no_admin_rights(client, register):
+    headers, _ = register(email="admin@example.com")
+    assert client.get("/api/admin/analytics/revenue", headers=headers).status_code == 403
+    assert client.post("/api/admin/analytics/rollup", headers=headers).status_code == 403
+
+
+def test_order_list_by_user_pages_newest_first():
+    storage = MemoryStorage()
+    for i, created_at in enumerate(["2026-01-01", "2026-01-02", "2026-01-02", "2026-01-03"]):
+        run(storage.orders.insert(order(f"o{i}", created_at)))
+
+    first = run(storage.orders.list_by_user("u1", None, 2))
+    assert [o["id"] for o in first] == ["o3", "o2"]
+    last = first[-1]
+    second = run(storage.orders.list_by_user("u1", (last["created_at"], last["id"]), 2))
+    assert [o["id"] for o in second] == ["o1", "o0"]
+
+
+def test_rollups_pick_up_late_status_changes():
+    storage = MemoryStorage()
+    run(storage.orders.insert(order("old", "2026-01-05T10:00:00+00:00")))
+    run(storage.orders.insert(order("old2", "2026-01-05T11:00:00+00:00", status="approved")))
+    run(storage.orders.insert(order("other", "2026-03-05T10:00:00+00:00")))
+    run(storage.orders.rollup_daily_stats(None, "first"))
+    assert run(storage.orders.has_daily_stats())
+
+    run(storage.orders.update_status("old", "approved", "2026-10-19T00:00:00+00:00"))
+    run(storage.orders.rollup_daily_stats("2026-10-16", "second"))
+
+    rows = {r["day"]: r for r in run(storage.orders.daily_stats("2026-01-01"))}
+    assert (rows["2026-01-05"]["approved"], rows["2026-01-05"]["revenue"]) == (2, 200)
+    assert rows["2026-01-05"]["updated_at"] == "second"
+    # Days without changes in the window are left alone
+    assert rows["2026-03-05"]["updated_at"] == "first"
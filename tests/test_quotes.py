@@ -0,0 +1,49 @@
+import server
+from tests.conftest import create_vehicle
+
+
+def test_quotes(client, driver):
+    headers, _ = driver
+    create_vehicle(client, headers, capacity_tons=25.0, price_per_km=12.0)
+    create_vehicle(client, headers, capacity_tons=25.0, price_per_km=11.0)
+
+    response = client.post("/api/quotes", json={
+        "origin": "Kyiv", "destination": "Львів", "cargo_weight_tons": 24
+    })
+    assert response.status_code == 200
+    body = response.json()
+    assert body["distance_km"] == 540
+    prices = [q["total_price"] for q in body["quotes"]]
+    assert prices == sorted(prices)
+    assert all(q["vehicle"]["capacity_tons"] >= 24 for q in body["quotes"])
+
+
+def test_quotes_rejects_bad_cities(client):
+    assert client.post("/api/quotes", json={"origin": "Atlantis", "destination": "Київ"}).status_code == 400
+    assert client.post("/api/quotes", json={"origin": "kyiv", "destination": "Київ"}).status_code == 400
+
+
+def test_quotes_turn_cargo_on_the_floor(client, driver):
+    headers, _ = driver
+    # Listed width-first; a 2.4 x 1.8 box only fits turned
+    van = create_vehicle(client, headers, dimensions_length=2.0, dimensions_width=3.0, price_per_km=0.01)
+    quote = {"origin": "Київ", "destination": "Одеса", "cargo_length": 2.4, "cargo_width": 1.8, "limit": 100}
+    ids = [q["vehicle"]["id"] for q in client.post("/api/quotes", json=quote).json()["quotes"]]
+    assert van["id"] in ids
+
+    quote["cargo_width"] = 2.1
+    ids = [q["vehicle"]["id"] for q in client.post("/api/quotes", json=quote).json()["quotes"]]
+    assert van["id"] not in ids
+
+
+def test_quotes_reject_non_positive_requirements(client):
+    for field in ("cargo_weight_tons", "cargo_length", "cargo_width", "cargo_height", "passengers"):
+        quote = {"origin": "Київ", "destination": "Львів", field: 0}
+        assert client.post("/api/quotes", json=quote).status_code == 422
+
+
+def test_distance_cache_is_keyed_on_normalized_names():
+    server.get_distance_km.cache_clear()
+    for origin in ("Kyiv", " kyiv", "Київ"):
+        assert server.get_distance_km(server.normalize_city(origin), "Львів") == 540
+    assert server.get_distance_km.cache_info().currsize == 1
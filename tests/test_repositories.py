@@ -0,0 +1,42 @@
+import asyncio
+from types import SimpleNamespace
+
+from repositories import MemoryStorage, MotorUserRepo, MotorVehicleRepo
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_vehicle_search_filters_and_sorting():
+    storage = MemoryStorage()
+    for vehicle_id, capacity, price, available in [("a", 5, 30, True), ("b", 20, 10, True),
+                                                   ("c", None, 5, True), ("d", 30, 1, False)]:
+        run(storage.vehicles.insert({
+            "id": vehicle_id, "user_id": "u1", "vehicle_type": "cargo",
+            "capacity_tons": capacity, "price_per_km": price, "available": available,
+        }))
+
+    assert [v["id"] for v in run(storage.vehicles.search())] == ["a", "b", "c"]
+    assert [v["id"] for v in run(storage.vehicles.search(min_capacity=4))] == ["a", "b"]
+    assert [v["id"] for v in run(storage.vehicles.search(sort_by_price=True, limit=2))] == ["c", "b"]
+    assert run(storage.vehicles.search(vehicle_type="passenger")) == []
+
+
+def test_ids_by_user():
+    storage = MemoryStorage()
+    for vehicle_id, user_id in [("a", "u1"), ("b", "u2"), ("c", "u1")]:
+        run(storage.vehicles.insert({"id": vehicle_id, "user_id": user_id, "vehicle_type": "cargo"}))
+
+    assert run(storage.vehicles.ids_by_user("u1")) == ["a", "c"]
+    assert run(storage.vehicles.ids_by_user("nobody")) == []
+
+
+def test_motor_get_many_skips_empty_lookups():
+    class UnusedCollection:
+        def find(self, *args, **kwargs):
+            raise AssertionError("no query expected")
+
+    db = SimpleNamespace(users=UnusedCollection(), vehicles=UnusedCollection(), vehicle_stats=None)
+    assert run(MotorUserRepo(db).get_many(iter([]))) == {}
+    assert run(MotorVehicleRepo(db).get_many([])) == []
@@ -0,0 +1,41 @@
+import asyncio
+from types import SimpleNamespace
+
+from repositories import MotorUserRepo, MotorVehicleRepo
+from tests.conftest import create_vehicle
+
+
+class RecordingCollection:
+    def __init__(self):
+        self.indexes = []
+
+    async def create_index(self, keys, **options):
+        self.indexes.append((keys, options))
+
+
+def test_vehicles_batch(client, driver):
+    headers, _ = driver
+    first = create_vehicle(client, headers)
+    second = create_vehicle(client, headers)
+
+    response = client.get(f"/api/vehicles/batch?ids={second['id']},missing,{first['id']},{second['id']}")
+    assert response.status_code == 200
+    assert [v["id"] for v in response.json()["vehicles"]] == [second["id"], first["id"]]
+    assert response.json()["missing"] == ["missing"]
+
+    response = client.post("/api/vehicles/batch", json={"ids": [first["id"]] * 301})
+    assert response.status_code == 200
+    response = client.post("/api/vehicles/batch", json={"ids": [str(i) for i in range(301)]})
+    assert response.status_code == 400
+
+
+def test_lookups_by_id_are_indexed():
+    db = SimpleNamespace(users=RecordingCollection(), vehicles=RecordingCollection(),
+                         vehicle_stats=RecordingCollection())
+    asyncio.run(MotorUserRepo(db).ensure_indexes())
+    asyncio.run(MotorVehicleRepo(db).ensure_indexes())
+
+    assert ("id", {"unique": True}) in db.users.indexes
+    assert ("email", {"unique": True}) in db.users.indexes
+    assert ("id", {"unique": True}) in db.vehicles.indexes
+    assert ("user_id", {}) in db.vehicles.indexes
@@ -0,0 +1,84 @@
+import asyncio
+import logging
+
+from pymongo.errors import BulkWriteError
+
+import server
+from repositories import MemoryStorage
+from tests.conftest import create_vehicle
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_vehicle_analytics(client, driver, register):
+    headers, _ = driver
+    vehicle = create_vehicle(client, headers)
+    client.get(f"/api/vehicles/{vehicle['id']}")
+    client.get(f"/api/vehicles/{vehicle['id']}")
+    assert client.post(f"/api/vehicles/{vehicle['id']}/contact").status_code == 200
+    assert client.post("/api/vehicles/unknown/contact").status_code == 404
+    client.portal.call(server.vehicle_events.flush)
+
+    stats = client.get("/api/analytics/vehicles", headers=headers).json()
+    assert [(s["vehicle_id"], s["views"], s["contacts"]) for s in stats] == [(vehicle["id"], 2, 1)]
+
+    no_subscription, _ = register()
+    assert client.get("/api/analytics/vehicles", headers=no_subscription).status_code == 403
+
+
+def test_flush_restores_only_failed_upserts(monkeypatch):
+    buffer = server.VehicleEventBuffer(max_keys=10)
+    written = {}
+
+    async def partially_failing(counts):
+        written.update(counts)
+        raise BulkWriteError({"writeErrors": [{"index": 1}]})
+
+    monkeypatch.setattr(server.storage.vehicles, "increment_stats", partially_failing)
+    buffer.record("views", ["a", "b", "c"])
+    run(buffer.flush())
+
+    assert len(written) == 3
+    assert [vehicle_id for vehicle_id, _ in buffer._counts] == ["b"]
+
+
+def test_watermark_flush_logs_unexpected_errors(monkeypatch, caplog):
+    buffer = server.VehicleEventBuffer(max_keys=4, high_watermark=0.5)
+
+    async def broken(counts):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(server.storage.vehicles, "increment_stats", broken)
+
+    async def record_past_watermark():
+        buffer.record("impressions", ["a", "b"])
+        task = buffer._flush_task
+        await asyncio.wait([task])
+        await asyncio.sleep(0)
+
+    with caplog.at_level(logging.ERROR, logger="server"):
+        run(record_past_watermark())
+
+    assert buffer._flush_task is None
+    failure = next(r for r in caplog.records if r.getMessage().startswith("Vehicle stats flush failed"))
+    assert isinstance(failure.exc_info[1], RuntimeError)
+
+
+def test_stats_by_day():
+    storage = MemoryStorage()
+    run(storage.vehicles.increment_stats({
+        ("v1", "2026-10-18T23"): {"impressions": 3, "views": 1, "contacts": 0},
+        ("v1", "2026-10-19T01"): {"impressions": 2, "views": 0, "contacts": 1},
+        ("v1", "2026-10-19T02"): {"impressions": 1, "views": 1, "contacts": 0},
+        ("v2", "2026-10-19T01"): {"impressions": 5, "views": 5, "contacts": 5},
+        ("v1", "2026-10-10T00"): {"impressions": 9, "views": 9, "contacts": 9},
+    }))
+    run(storage.vehicles.increment_stats({("v1", "2026-10-19T01"): {"impressions": 1, "views": 0, "contacts": 0}}))
+
+    rows = run(storage.vehicles.stats_by_day(["v1"], "2026-10-18"))
+    assert rows == [
+        {"vehicle_id": "v1", "day": "2026-10-18", "impressions": 3, "views": 1, "contacts": 0},
+        {"vehicle_id": "v1", "day": "2026-10-19", "impressions": 4, "views": 1, "contacts": 1},
+    ]